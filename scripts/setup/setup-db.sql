@@ -68,7 +68,7 @@ CREATE TABLE IF NOT EXISTS script_tags (
 -- AI Analysis table
 CREATE TABLE IF NOT EXISTS script_analysis (
     id SERIAL PRIMARY KEY,
-    script_id INTEGER REFERENCES scripts(id) ON DELETE CASCADE,
+    script_id INTEGER REFERENCES scripts(id) ON DELETE CASCADE UNIQUE,
     purpose TEXT,
     security_score FLOAT,
     quality_score FLOAT,
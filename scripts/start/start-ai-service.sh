@@ -28,4 +28,5 @@ fi
 
 # Start the AI service
 echo "Starting AI service..."
-cd src/ai && python -m uvicorn main:app --reload --host 0.0.0.0 --port 8001
+# uvloop + httptools when installed; set AI_RELOAD=true for auto-reload while developing
+cd src/ai && AI_SERVICE_PORT=8001 python main.py
@@ -328,9 +328,14 @@ class AgentCoordinator:
             categorization_task = asyncio.create_task(
                 self._execute_categorization(script_content)
             )
-            documentation_task = asyncio.create_task(
-                self._execute_documentation_search(script_content)
-            )
+            # The documentation search is only worth its LLM call when the
+            # caller asked for references (metadata-less callers always did)
+            if (metadata or {}).get("fetch_ms_docs", True):
+                documentation_task = asyncio.create_task(
+                    self._execute_documentation_search(script_content)
+                )
+            else:
+                documentation_task = asyncio.sleep(0, result={})
 
             # Wait for all tasks to complete
             analysis_result, embedding, security_result, categorization_result, documentation_result = await asyncio.gather(
@@ -6,7 +6,9 @@ including LangChain, AutoGPT, Hybrid, LangGraph, Py-g agents, and OpenAI Assista
 It selects the appropriate agent based on the user's request and available API keys.
 """
 
+import os
 import logging
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional
 
 # Import agent implementations
@@ -51,6 +53,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger("agent_factory")
 
+# Agents are cached per (type, API key); requests may bring their own keys,
+# so keep only the most recently used instances
+AGENT_CACHE_SIZE = int(os.getenv("AGENT_CACHE_SIZE", "32"))
+
 class AgentFactory:
     """
     Factory for creating and managing different types of agents.
@@ -58,7 +64,7 @@ class AgentFactory:
     
     def __init__(self):
         """Initialize the agent factory."""
-        self.agents = {}
+        self.agents: "OrderedDict[str, Any]" = OrderedDict()
         self.default_agent_type = "langchain"
         logger.info("Agent factory initialized")
         
@@ -92,9 +98,11 @@ class AgentFactory:
         agent_key = f"{agent_type}_{api_key}"
         
         # Return existing agent if available
-        if agent_key in self.agents:
-            logger.info(f"Returning existing {agent_type} agent")
-            return self.agents[agent_key]
+        agent = self.agents.get(agent_key)
+        if agent is not None:
+            self.agents.move_to_end(agent_key)
+            logger.debug(f"Returning existing {agent_type} agent")
+            return agent
         
         # Create a new agent
         try:
@@ -135,8 +143,10 @@ class AgentFactory:
                 logger.warning(f"Unknown agent type: {agent_type}, using default")
                 return self.get_agent(self.default_agent_type, api_key)
             
-            # Store the agent for reuse
+            # Store the agent for reuse, evicting the least recently used
             self.agents[agent_key] = agent
+            if len(self.agents) > AGENT_CACHE_SIZE:
+                self.agents.popitem(last=False)
             return agent
             
         except Exception as e:
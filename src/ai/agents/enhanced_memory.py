@@ -396,28 +396,24 @@ class LongTermMemory:
         if embedding_function is not None and self.embeddings:
             query_embedding = embedding_function(query)
             
-            # Calculate similarity scores
-            scores = {}
-            for memory_id, embedding in self.embeddings.items():
-                if memory_id in self.memories:
-                    entry = self.memories[memory_id]
-                    
-                    # Filter by memory type if specified
-                    if memory_type is not None and entry.memory_type != memory_type:
-                        continue
-                    
-                    # Calculate cosine similarity
-                    similarity = self._cosine_similarity(query_embedding, embedding)
-                    scores[memory_id] = similarity
-            
-            # Sort by similarity score
-            sorted_ids = sorted(scores.keys(), key=lambda mid: scores[mid], reverse=True)
-            
-            # Get top results
-            for memory_id in sorted_ids[:limit]:
-                entry = self.memories[memory_id]
+            # Candidate memories (filtered by memory type if specified)
+            candidate_ids = [
+                memory_id for memory_id in self.embeddings
+                if memory_id in self.memories
+                and (memory_type is None or self.memories[memory_id].memory_type == memory_type)
+            ]
+            
+            # Score all candidates at once with cosine similarity
+            scores = self._cosine_similarities(
+                query_embedding,
+                [self.embeddings[memory_id] for memory_id in candidate_ids]
+            )
+            
+            # Get top results, highest similarity first
+            for index in sorted(range(len(candidate_ids)), key=lambda i: scores[i], reverse=True)[:limit]:
+                entry = self.memories[candidate_ids[index]]
                 entry.access()
-                results.append((entry.content, scores[memory_id]))
+                results.append((entry.content, float(scores[index])))
         
         # Otherwise, do simple keyword search
         else:
@@ -536,25 +532,29 @@ class LongTermMemory:
         if self.storage_path and (time.time() - self.last_save_time) > 60:  # Save every minute
             self.save()
     
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
+    def _cosine_similarities(self, query: List[float], vectors: List[List[float]]) -> List[float]:
         """
-        Calculate cosine similarity between two vectors.
+        Calculate cosine similarity between a query and many vectors.
         
         Args:
-            vec1: First vector
-            vec2: Second vector
+            query: Query vector
+            vectors: Vectors to compare against
             
         Returns:
-            Cosine similarity (-1 to 1, higher is more similar)
+            Cosine similarities (-1 to 1, higher is more similar), one per vector
         """
         import numpy as np
         
-        # Convert to numpy arrays
-        a = np.array(vec1)
-        b = np.array(vec2)
+        if not vectors:
+            return []
         
-        # Calculate cosine similarity
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+        # One matrix-vector product instead of a Python loop per memory
+        matrix = np.asarray(vectors, dtype=np.float32)
+        q = np.asarray(query, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)  # normalize the query once, not per row
+        norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+        norms[norms == 0] = 1.0
+        return ((matrix @ q) / norms).tolist()
 
 class EpisodicMemory:
     """
@@ -37,6 +37,7 @@ def create_openai_tools_agent(llm, tools, prompt):
 # Local imports (after wrapper function) - noqa: E402
 from .base_agent import BaseAgent  # noqa: E402
 from analysis.script_analyzer import ScriptAnalyzer  # noqa: E402
+from analysis.categories import CATEGORY_DESCRIPTIONS, CATEGORY_IDS, DEFAULT_CATEGORY_ID  # noqa: E402
 
 # Configure logging
 logging.basicConfig(
@@ -182,19 +183,7 @@ class ScriptCategorizationTool(BaseTool):
             The category of the script with explanation
         """
         try:
-            # Define categories
-            categories = {
-                "System Administration": "Scripts for managing Windows/Linux systems, including system configuration, maintenance, and monitoring.",
-                "Security & Compliance": "Scripts for security auditing, hardening, compliance checks, vulnerability scanning, and implementing security best practices.",
-                "Automation & DevOps": "Scripts that automate repetitive tasks, create workflows, CI/CD pipelines, and streamline IT processes.",
-                "Cloud Management": "Scripts for managing resources on Azure, AWS, GCP, and other cloud platforms, including provisioning and configuration.",
-                "Network Management": "Scripts for network configuration, monitoring, troubleshooting, and management of network devices and services.",
-                "Data Management": "Scripts for database operations, data processing, ETL (Extract, Transform, Load), and data analysis tasks.",
-                "Active Directory": "Scripts for managing Active Directory, user accounts, groups, permissions, and domain services.",
-                "Monitoring & Diagnostics": "Scripts for system monitoring, logging, diagnostics, performance analysis, and alerting.",
-                "Backup & Recovery": "Scripts for data backup, disaster recovery, system restore, and business continuity operations.",
-                "Utilities & Helpers": "General-purpose utility scripts, helper functions, and reusable modules for various administrative tasks."
-            }
+            categories = CATEGORY_DESCRIPTIONS
             
             script_lower = script_content.lower()
             
@@ -716,19 +705,7 @@ If you have all the information you need to respond to the user, provide a final
 
     def _get_category_id(self, category: str) -> int:
         """Map category name to ID."""
-        category_map = {
-            "System Administration": 1,
-            "Security & Compliance": 2,
-            "Automation & DevOps": 3,
-            "Cloud Management": 4,
-            "Network Management": 5,
-            "Data Management": 6,
-            "Active Directory": 7,
-            "Monitoring & Diagnostics": 8,
-            "Backup & Recovery": 9,
-            "Utilities & Helpers": 10
-        }
-        return category_map.get(category, 10)
+        return CATEGORY_IDS.get(category, DEFAULT_CATEGORY_ID)
 
     def _get_default_analysis(self, error: str = None) -> Dict[str, Any]:
         """Return default analysis results."""
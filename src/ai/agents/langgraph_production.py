@@ -106,8 +106,19 @@ class PowerShellAnalysisState(TypedDict):
 # Tools Definition
 # ============================================================================
 
+_script_analyzer: Optional[ScriptAnalyzer] = None
+
+
+def _get_script_analyzer() -> ScriptAnalyzer:
+    """Return the shared ScriptAnalyzer used by the analysis tool."""
+    global _script_analyzer
+    if _script_analyzer is None:
+        _script_analyzer = ScriptAnalyzer(use_cache=True)
+    return _script_analyzer
+
+
 @tool
-def analyze_powershell_script(script_content: str) -> str:
+async def analyze_powershell_script(script_content: str) -> str:
     """
     Analyze a PowerShell script for its purpose, functionality, and basic metrics.
 
@@ -118,13 +129,9 @@ def analyze_powershell_script(script_content: str) -> str:
         JSON string containing analysis results including purpose, complexity, and parameters
     """
     try:
-        analyzer = ScriptAnalyzer(use_cache=True)
-        if hasattr(analyzer, "analyze_script_content"):
-            result = analyzer.analyze_script_content(script_content)
-        elif hasattr(analyzer, "analyze_script"):
-            result = analyzer.analyze_script(script_content)
-        else:
-            raise AttributeError("ScriptAnalyzer does not expose a script analysis method")
+        # Await the async analyzer directly; the sync wrapper spins up a
+        # thread and a second event loop for every call.
+        result = await _get_script_analyzer().analyze_script_async(script_content)
 
         analysis = {
             "purpose": result.get("purpose", "Unknown"),
@@ -832,6 +839,51 @@ class LangGraphProductionOrchestrator:
             "requires_human_review": state.get("requires_human_review", False)
         }
 
+    async def get_workflow_state(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the checkpointed state of a workflow without re-running it.
+
+        Args:
+            thread_id: The workflow thread ID
+
+        Returns:
+            Formatted workflow state, or None if no checkpoint exists
+        """
+        config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "model": self.model
+            }
+        }
+
+        snapshot = await self.graph.aget_state(config)
+        if not snapshot or not snapshot.values:
+            return None
+        return self._format_response(snapshot.values)
+
+    async def delete_workflow_state(self, thread_id: str) -> bool:
+        """
+        Drop every checkpoint stored for a workflow thread.
+
+        Args:
+            thread_id: The workflow thread ID
+
+        Returns:
+            True if the checkpointer supports deletion and it succeeded
+        """
+        delete_thread = getattr(self.checkpointer, "delete_thread", None)
+        if delete_thread is None:
+            logger.debug("Checkpointer %s cannot delete threads", type(self.checkpointer).__name__)
+            return False
+
+        try:
+            # PostgresSaver deletes over a blocking connection; keep it off the loop
+            await asyncio.to_thread(delete_thread, thread_id)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to delete checkpoints for thread {thread_id}: {e}")
+            return False
+
     async def continue_with_feedback(
         self,
         thread_id: str,
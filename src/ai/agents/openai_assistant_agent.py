@@ -263,6 +263,50 @@ class OpenAIAssistantAgent:
         
         return thread.id
     
+    @backoff.on_exception(
+        backoff.expo,
+        (Exception),
+        max_tries=MAX_RETRIES,
+        max_value=MAX_RETRY_DELAY,
+        on_backoff=lambda details: logger.warning(
+            f"Retrying thread creation after error. Attempt {details['tries']}/{MAX_RETRIES}"
+        )
+    )
+    async def get_or_create_thread_async(self, session_id: Optional[str] = None) -> str:
+        """
+        Async variant of get_or_create_thread for use inside request handlers.
+        
+        Args:
+            session_id: Optional session identifier
+            
+        Returns:
+            Thread ID
+        """
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        
+        if session_id in self.thread_map:
+            # Verify the thread still exists
+            try:
+                await self.async_client.beta.threads.retrieve(self.thread_map[session_id])
+                return self.thread_map[session_id]
+            except Exception as e:
+                logger.warning(f"Thread {self.thread_map[session_id]} no longer exists: {e}")
+                # Continue to create a new thread
+        
+        # Create a new thread with metadata
+        thread = await self.async_client.beta.threads.create(
+            metadata={
+                "session_id": session_id,
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "client": "psscript_platform"
+            }
+        )
+        self.thread_map[session_id] = thread.id
+        logger.info(f"Created new thread: {thread.id} for session: {session_id}")
+        
+        return thread.id
+    
     @backoff.on_exception(
         backoff.expo,
         (Exception),
@@ -298,7 +342,7 @@ class OpenAIAssistantAgent:
         
         try:
             # Get or create a thread for this session
-            thread_id = self.get_or_create_thread(session_id)
+            thread_id = await self.get_or_create_thread_async(session_id)
             
             # Extract the last user message (the most recent one)
             user_message = None
@@ -534,33 +578,27 @@ class OpenAIAssistantAgent:
         """
         try:
             # Create a one-time thread for this analysis
-            thread = self.client.beta.threads.create()
+            thread = await self.async_client.beta.threads.create()
             
             # Craft the analysis prompt based on analysis type
             prompt = self._create_analysis_prompt(script_content, script_name, analysis_type)
             
             # Add the message to the thread
-            self.client.beta.threads.messages.create(
+            await self.async_client.beta.threads.messages.create(
                 thread_id=thread.id,
                 role="user",
                 content=prompt
             )
             
             # Run the assistant on the thread
-            run = self.client.beta.threads.runs.create(
+            run = await self.async_client.beta.threads.runs.create(
                 thread_id=thread.id,
                 assistant_id=self.assistant_id
             )
             
-            # Poll for completion (using sync client for simplicity)
+            # Poll for completion without blocking the event loop
+            run = await self._wait_for_run_completion(thread.id, run.id)
             status = run.status
-            while status not in ["completed", "failed", "cancelled", "expired"]:
-                time.sleep(1)
-                run = self.client.beta.threads.runs.retrieve(
-                    thread_id=thread.id,
-                    run_id=run.id
-                )
-                status = run.status
             
             if status != "completed":
                 logger.error(f"Run failed with status: {status}")
@@ -570,7 +608,7 @@ class OpenAIAssistantAgent:
                 }
             
             # Get the assistant's response
-            messages = self.client.beta.threads.messages.list(
+            messages = await self.async_client.beta.threads.messages.list(
                 thread_id=thread.id,
                 order="desc",
                 limit=1
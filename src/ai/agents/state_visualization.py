@@ -13,8 +13,6 @@ from typing import Dict, List, Any, Optional
 from enum import Enum, auto
 from datetime import datetime
 import networkx as nx
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch
 import numpy as np
 
 # Configure logging
@@ -447,6 +445,8 @@ class StateVisualizer:
         Returns:
             Path to the saved visualization, or None if not saved
         """
+        # matplotlib is only needed when a visualization is rendered
+        import matplotlib.pyplot as plt
         # Extract keys and create the attention matrix
         keys = list(attention_weights.keys())
         attention_matrix = np.zeros((len(keys), len(keys)))
@@ -514,6 +514,9 @@ class StateVisualizer:
         Returns:
             Path to the saved visualization, or None if not saved
         """
+        # matplotlib is only needed when a visualization is rendered
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Patch
         # Create a graph
         G = nx.DiGraph()
         
@@ -617,6 +620,8 @@ class StateVisualizer:
         Returns:
             Path to the saved visualization, or None if not saved
         """
+        # matplotlib is only needed when a visualization is rendered
+        import matplotlib.pyplot as plt
         # Sort messages by timestamp if available
         if include_timestamps and all("timestamp" in msg for msg in messages):
             sorted_messages = sorted(messages, key=lambda m: m["timestamp"])
@@ -717,6 +722,9 @@ class StateVisualizer:
         Returns:
             Path to the saved visualization, or None if not saved
         """
+        # matplotlib is only needed when a visualization is rendered
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Patch
         # Sort tasks
         if sort_by == "deadline":
             sorted_tasks = sorted(
@@ -836,6 +844,9 @@ class StateVisualizer:
         Returns:
             Path to the saved visualization, or None if not saved
         """
+        # matplotlib is only needed when a visualization is rendered
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Patch
         # Create a graph
         G = nx.DiGraph()
         
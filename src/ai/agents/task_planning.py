@@ -13,7 +13,6 @@ from enum import Enum, auto
 from datetime import datetime, timedelta
 import uuid
 import networkx as nx
-import matplotlib.pyplot as plt
 from dataclasses import dataclass, field
 
 # Configure logging
@@ -662,6 +661,9 @@ class TaskGraph:
         Args:
             filename: Filename to save the visualization to (optional)
         """
+        # matplotlib is only needed when a visualization is rendered
+        import matplotlib.pyplot as plt
+
         # Create a copy of the graph for visualization
         viz_graph = self.graph.copy()
         
@@ -17,6 +17,8 @@ from typing import Dict, List, Any, Optional, Callable, TypedDict
 from enum import Enum, auto
 from datetime import datetime
 
+from analysis.categories import CATEGORY_DESCRIPTIONS
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -523,7 +525,9 @@ class ToolRegistry:
             if asyncio.iscoroutinefunction(tool.function):
                 result = await tool.function(**args)
             else:
-                result = tool.function(**args)
+                # Sync tools are regex/keyword scans over the whole script;
+                # run them in a worker thread so the event loop keeps serving
+                result = await asyncio.to_thread(tool.function, **args)
             
             execution_time = time.time() - start_time
             
@@ -942,19 +946,7 @@ def categorize_script(script_content: str) -> Dict[str, Any]:
     Returns:
         The category of the script with explanation
     """
-    # Define categories
-    categories = {
-        "System Administration": "Scripts for managing Windows/Linux systems, including system configuration, maintenance, and monitoring.",
-        "Security & Compliance": "Scripts for security auditing, hardening, compliance checks, vulnerability scanning, and implementing security best practices.",
-        "Automation & DevOps": "Scripts that automate repetitive tasks, create workflows, CI/CD pipelines, and streamline IT processes.",
-        "Cloud Management": "Scripts for managing resources on Azure, AWS, GCP, and other cloud platforms, including provisioning and configuration.",
-        "Network Management": "Scripts for network configuration, monitoring, troubleshooting, and management of network devices and services.",
-        "Data Management": "Scripts for database operations, data processing, ETL (Extract, Transform, Load), and data analysis tasks.",
-        "Active Directory": "Scripts for managing Active Directory, user accounts, groups, permissions, and domain services.",
-        "Monitoring & Diagnostics": "Scripts for system monitoring, logging, diagnostics, performance analysis, and alerting.",
-        "Backup & Recovery": "Scripts for data backup, disaster recovery, system restore, and business continuity operations.",
-        "Utilities & Helpers": "General-purpose utility scripts, helper functions, and reusable modules for various administrative tasks."
-    }
+    categories = CATEGORY_DESCRIPTIONS
     
     script_lower = script_content.lower()
     
@@ -3,5 +3,6 @@ Analysis module for PowerShell script analysis.
 """
 
 from .script_analyzer import ScriptAnalyzer
+from .categories import CATEGORIES, CATEGORY_IDS, CATEGORY_DESCRIPTIONS
 
-__all__ = ['ScriptAnalyzer']
+__all__ = ['ScriptAnalyzer', 'CATEGORIES', 'CATEGORY_IDS', 'CATEGORY_DESCRIPTIONS']
@@ -0,0 +1,71 @@
+"""
+Script Categories
+
+The fixed category table, shared by the API (/categories, analysis tagging),
+the LangGraph agent and the categorization tool so they cannot drift apart.
+"""
+
+from types import MappingProxyType
+
+CATEGORIES = (
+    {
+        "id": 1,
+        "name": "System Administration",
+        "description": "Scripts for managing Windows/Linux systems, including system configuration, maintenance, and monitoring."
+    },
+    {
+        "id": 2,
+        "name": "Security & Compliance",
+        "description": "Scripts for security auditing, hardening, compliance checks, vulnerability scanning, and implementing security best practices."
+    },
+    {
+        "id": 3,
+        "name": "Automation & DevOps",
+        "description": "Scripts that automate repetitive tasks, create workflows, CI/CD pipelines, and streamline IT processes."
+    },
+    {
+        "id": 4,
+        "name": "Cloud Management",
+        "description": "Scripts for managing resources on Azure, AWS, GCP, and other cloud platforms, including provisioning and configuration."
+    },
+    {
+        "id": 5,
+        "name": "Network Management",
+        "description": "Scripts for network configuration, monitoring, troubleshooting, and management of network devices and services."
+    },
+    {
+        "id": 6,
+        "name": "Data Management",
+        "description": "Scripts for database operations, data processing, ETL (Extract, Transform, Load), and data analysis tasks."
+    },
+    {
+        "id": 7,
+        "name": "Active Directory",
+        "description": "Scripts for managing Active Directory, user accounts, groups, permissions, and domain services."
+    },
+    {
+        "id": 8,
+        "name": "Monitoring & Diagnostics",
+        "description": "Scripts for system monitoring, logging, diagnostics, performance analysis, and alerting."
+    },
+    {
+        "id": 9,
+        "name": "Backup & Recovery",
+        "description": "Scripts for data backup, disaster recovery, system restore, and business continuity operations."
+    },
+    {
+        "id": 10,
+        "name": "Utilities & Helpers",
+        "description": "General-purpose utility scripts, helper functions, and reusable modules for various administrative tasks."
+    }
+)
+
+# Read-only lookups derived from the table
+CATEGORY_IDS = MappingProxyType({category["name"]: category["id"] for category in CATEGORIES})
+CATEGORY_DESCRIPTIONS = MappingProxyType(
+    {category["name"]: category["description"] for category in CATEGORIES}
+)
+
+# Scripts that fit nowhere else
+DEFAULT_CATEGORY = "Utilities & Helpers"
+DEFAULT_CATEGORY_ID = CATEGORY_IDS[DEFAULT_CATEGORY]
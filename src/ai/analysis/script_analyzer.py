@@ -7,10 +7,13 @@ caching, error handling, and concurrent processing capabilities.
 
 import os
 import json
+import base64
 import time
 import logging
 import asyncio
 import hashlib
+import threading
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple, Any
 
@@ -77,6 +80,175 @@ EMBEDDING_DIMENSION = 3072  # text-embedding-3-large dimension (can be customize
 CACHE_TTL = int(os.getenv("CACHE_TTL", "86400"))  # Default: 1 day in seconds
 MAX_WORKERS = int(os.getenv("MAX_WORKERS", "5"))  # Default: 5 concurrent workers
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "60"))  # Request timeout in seconds
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))  # Max inputs per embeddings call
+EMBEDDING_BATCH_WINDOW_MS = int(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))  # Max wait to fill a batch
+EMBEDDING_MAX_INPUTS = int(os.getenv("EMBEDDING_MAX_INPUTS", "2048"))  # API limit on inputs per embeddings call
+EMBEDDING_BATCH_CONCURRENCY = int(os.getenv("EMBEDDING_BATCH_CONCURRENCY", "4"))  # Bulk embeddings calls in flight
+EMBEDDING_LRU_SIZE = int(os.getenv("EMBEDDING_LRU_SIZE", "2048"))  # In-process embeddings kept (~12KB each)
+
+
+class EmbeddingLRU:
+    """
+    In-process LRU of embeddings keyed by the SHA-256 digest of their text.
+
+    Sits in front of the Redis/disk cache so repeated content is answered
+    without a network round trip or a disk read. Vectors are held as float32
+    arrays to keep each entry small, and returned as lists like the API does.
+    """
+
+    def __init__(self, maxsize: int = EMBEDDING_LRU_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        # The sync generate_embedding wrapper runs the async path in worker threads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = self._key(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return vector.tolist()
+
+    def put(self, text: str, embedding: List[float]) -> None:
+        if self.maxsize <= 0:
+            return
+        key = self._key(text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched OpenAI calls.
+
+    Callers await embed(); a background task drains the queue every
+    EMBEDDING_BATCH_WINDOW_MS (or as soon as EMBEDDING_BATCH_SIZE inputs are
+    waiting), sends one embeddings request for the whole batch and resolves
+    each caller's future with its vector. Concurrent callers asking for the
+    same text share one pending future, so a text is embedded once per batch.
+
+    The queue, pending map and worker are kept per event loop (the sync
+    wrappers run their own loops), so a loop never reads another loop's
+    futures or orphans its worker.
+    """
+
+    def __init__(
+        self,
+        analyzer: "ScriptAnalyzer",
+        max_batch_size: int = EMBEDDING_BATCH_SIZE,
+        max_wait_ms: int = EMBEDDING_BATCH_WINDOW_MS
+    ):
+        self.analyzer = analyzer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # event loop -> (queue, pending futures by text, worker task)
+        self._loops: Dict[
+            asyncio.AbstractEventLoop,
+            Tuple[asyncio.Queue, Dict[str, asyncio.Future], asyncio.Task]
+        ] = {}
+
+    def _loop_state(
+        self,
+        loop: asyncio.AbstractEventLoop
+    ) -> Tuple[asyncio.Queue, Dict[str, asyncio.Future]]:
+        """Return loop's queue and pending map, starting its worker if needed."""
+        state = self._loops.get(loop)
+        if state is None or state[2].done():
+            # Forget loops that have since been closed (finished asyncio.run calls)
+            for closed in [other for other in self._loops if other.is_closed()]:
+                del self._loops[closed]
+            queue: asyncio.Queue = asyncio.Queue()
+            pending: Dict[str, asyncio.Future] = {}
+            state = self._loops[loop] = (queue, pending, loop.create_task(self._run(queue, pending)))
+        return state[0], state[1]
+
+    async def embed(self, text: str) -> List[float]:
+        """Return the embedding for text, batched with other concurrent callers."""
+        cached_result = await self.analyzer._get_cached_embedding_async(text)
+        if cached_result:
+            logger.debug("Using cached embedding")
+            return cached_result
+
+        loop = asyncio.get_running_loop()
+        queue, pending = self._loop_state(loop)
+        future = pending.get(text)
+        if future is None:
+            future = loop.create_future()
+            pending[text] = future
+            await queue.put((text, future))
+        # shield: one caller cancelling must not cancel the shared future
+        return await asyncio.shield(future)
+
+    async def _run(
+        self,
+        queue: asyncio.Queue,
+        pending: Dict[str, asyncio.Future]
+    ) -> None:
+        # The queue and pending map are bound to one event loop, so a worker
+        # never drains state created for a different loop
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._flush(batch)
+            finally:
+                for text, _ in batch:
+                    pending.pop(text, None)
+
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [text for text, _ in batch]
+        try:
+            embeddings = await self.analyzer._create_embeddings(texts)
+        except Exception as e:
+            logger.error(f"Error generating batched embeddings: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.debug(f"Generated {len(texts)} embeddings in one request")
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+        # Callers are already resumed; the cache writes finish on a worker thread
+        self.analyzer._cache_embeddings_in_background(texts, embeddings)
+
 
 class ScriptAnalyzer:
     """Analyzes PowerShell scripts using AI with caching and parallel processing."""
@@ -90,6 +262,8 @@ class ScriptAnalyzer:
         """
         self.use_cache = use_cache
         self.executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        self.embedding_batcher = EmbeddingBatcher(self)
+        self.embedding_lru = EmbeddingLRU()
         logger.info(f"ScriptAnalyzer initialized with model {ANALYSIS_MODEL}")
         
     def _generate_cache_key(self, script_content: str, prefix: str = "analysis") -> str:
@@ -138,6 +312,74 @@ class ScriptAnalyzer:
         except Exception as e:
             logger.warning(f"Disk cache save error: {e}")
     
+    def _get_cached_embedding(self, text: str) -> Optional[List[float]]:
+        """Look an embedding up in the in-process LRU, then in Redis/disk."""
+        if not self.use_cache:
+            return None
+        
+        embedding = self.embedding_lru.get(text)
+        if embedding is not None:
+            return embedding
+        
+        cached = self._get_from_cache(self._generate_cache_key(text, prefix="embedding"))
+        if not cached:
+            return None
+        
+        # Entries are packed float32; older entries are plain float lists
+        if isinstance(cached, str):
+            embedding = np.frombuffer(base64.b64decode(cached), dtype="<f4").tolist()
+        else:
+            embedding = cached
+        self.embedding_lru.put(text, embedding)
+        return embedding
+    
+    def _cache_embedding(self, text: str, embedding: List[float]) -> None:
+        """Store an embedding in the in-process LRU and in Redis/disk."""
+        if not self.use_cache:
+            return
+        
+        self.embedding_lru.put(text, embedding)
+        # Packed little-endian float32, base64-encoded so it also fits the JSON
+        # Redis cache: ~16 KB per 3072-d vector instead of ~60 KB of float text
+        packed = base64.b64encode(np.asarray(embedding, dtype="<f4").tobytes()).decode("ascii")
+        self._save_to_cache(self._generate_cache_key(text, prefix="embedding"), packed)
+    
+    async def _get_cached_embedding_async(self, text: str) -> Optional[List[float]]:
+        """Like _get_cached_embedding, but Redis/disk lookups run on the executor."""
+        if not self.use_cache:
+            return None
+        
+        embedding = self.embedding_lru.get(text)
+        if embedding is not None:
+            return embedding
+        
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._get_cached_embedding, text
+        )
+    
+    def _cache_embeddings_in_background(
+        self, texts: List[str], embeddings: List[List[float]]
+    ) -> None:
+        """Write embeddings to the LRU and Redis/disk caches from the executor."""
+        if not self.use_cache:
+            return
+        
+        def store() -> None:
+            for text, embedding in zip(texts, embeddings):
+                self._cache_embedding(text, embedding)
+        
+        asyncio.get_running_loop().run_in_executor(self.executor, store)
+    
+    async def generate_embedding_async(self, text: str) -> List[float]:
+        """
+        Generate vector embedding for the given text asynchronously.
+
+        Requests go through the embedding batcher, so concurrent callers
+        (semantic cache lookups, similarity search, agents) share OpenAI
+        round trips; retries happen per batch in _create_embeddings.
+        """
+        return await self.embedding_batcher.embed(text)
+    
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_exponential(min=1, max=20),
@@ -145,33 +387,61 @@ class ScriptAnalyzer:
             (Exception)  # Simplified error handling for compatibility
         )
     )
-    async def generate_embedding_async(self, text: str) -> List[float]:
-        """Generate vector embedding for the given text asynchronously."""
-        # Check cache first
-        cache_key = self._generate_cache_key(text, prefix="embedding")
-        cached_result = self._get_from_cache(cache_key)
-        if cached_result:
-            logger.debug("Using cached embedding")
-            return cached_result
-            
+    async def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts with a single embeddings API call."""
         async_openai_client = require_openai_client(async_mode=True)
+        response = await async_openai_client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts
+        )
+        # The API returns one item per input; order by index to be safe
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    async def generate_embeddings_async(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for many texts with as few API calls as possible.
+        
+        Cached texts are served from cache; the rest are de-duplicated and sent
+        EMBEDDING_MAX_INPUTS per request, with at most EMBEDDING_BATCH_CONCURRENCY
+        requests in flight.
+        """
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}
+        # One thread hop for all Redis/disk lookups instead of blocking the loop per text
+        cached_results = await asyncio.get_running_loop().run_in_executor(
+            self.executor, lambda: [self._get_cached_embedding(text) for text in texts]
+        )
+        for position, (text, cached_result) in enumerate(zip(texts, cached_results)):
+            if cached_result:
+                embeddings[position] = cached_result
+            else:
+                pending.setdefault(text, []).append(position)
+        
+        if not pending:
+            return embeddings
+        
+        unique_texts = list(pending)
+        chunks = [
+            unique_texts[start:start + EMBEDDING_MAX_INPUTS]
+            for start in range(0, len(unique_texts), EMBEDDING_MAX_INPUTS)
+        ]
+        semaphore = asyncio.Semaphore(EMBEDDING_BATCH_CONCURRENCY)
+        
+        async def embed_chunk(chunk: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self._create_embeddings(chunk)
+        
+        results = await asyncio.gather(*(embed_chunk(chunk) for chunk in chunks))
+        logger.debug(f"Generated {len(unique_texts)} embeddings in {len(chunks)} requests")
+        
+        for chunk, chunk_embeddings in zip(chunks, results):
+            for text, embedding in zip(chunk, chunk_embeddings):
+                for position in pending[text]:
+                    embeddings[position] = embedding
+            self._cache_embeddings_in_background(chunk, chunk_embeddings)
+        
+        return embeddings
 
-        try:
-            response = await async_openai_client.embeddings.create(
-                model=EMBEDDING_MODEL,
-                input=text
-            )
-            
-            embedding = response.data[0].embedding
-            
-            # Cache the result
-            self._save_to_cache(cache_key, embedding)
-            
-            return embedding
-        except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            raise
-    
     def generate_embedding(self, text: str) -> List[float]:
         """Synchronous wrapper for embedding generation."""
         # Check if vector operations are enabled in the main module
@@ -386,25 +656,26 @@ class ScriptAnalyzer:
         if not stored_embeddings:
             return []
             
-        # Function to compute similarity for a single script
-        def compute_similarity(script_id_embedding):
-            script_id, stored_embedding = script_id_embedding
-            # Calculate cosine similarity
-            similarity = np.dot(embedding, stored_embedding) / (
-                np.linalg.norm(embedding) * np.linalg.norm(stored_embedding)
-            )
-            return (script_id, float(similarity))
-        
-        # Use a background thread pool for parallel computation
+        def rank_similarities() -> List[Tuple[str, float]]:
+            # One matrix-vector product over unit vectors instead of a
+            # per-script Python loop; BLAS runs it without holding the GIL.
+            script_ids = list(stored_embeddings.keys())
+            matrix = np.asarray(list(stored_embeddings.values()), dtype=np.float32)
+            norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+            norms[norms == 0] = 1.0
+            query = np.asarray(embedding, dtype=np.float32)
+            query_unit = query / (np.linalg.norm(query) or 1.0)
+            scores = (matrix @ query_unit) / norms
+
+            candidates = np.flatnonzero(scores >= similarity_threshold)
+            if candidates.size > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            candidates = candidates[np.argsort(-scores[candidates])]
+            return [(script_ids[i], float(scores[i])) for i in candidates]
+
+        # Use a background thread pool for the computation
         loop = asyncio.get_event_loop()
-        similarities = await loop.run_in_executor(
-            self.executor,
-            lambda: list(map(compute_similarity, stored_embeddings.items()))
-        )
-        
-        # Filter by threshold and sort by similarity
-        similarities = [s for s in similarities if s[1] >= similarity_threshold]
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        similarities = await loop.run_in_executor(self.executor, rank_similarities)
         
         return similarities[:limit]
     
@@ -435,12 +706,11 @@ class ScriptAnalyzer:
     
     async def analyze_script_with_embedding_async(self, script_content: str) -> Dict[str, Any]:
         """Perform complete analysis including embedding generation asynchronously."""
-        # Run both tasks concurrently
-        embedding_task = self.generate_embedding_async(script_content)
-        analysis_task = self.analyze_script_async(script_content)
-        
-        embedding = await embedding_task
-        analysis = await analysis_task
+        # Run both tasks concurrently (awaiting bare coroutines in turn would not)
+        embedding, analysis = await asyncio.gather(
+            self.generate_embedding_async(script_content),
+            self.analyze_script_async(script_content)
+        )
         
         # Combine results
         result = {
@@ -467,21 +737,21 @@ class ScriptAnalyzer:
     
     async def batch_analyze_scripts_async(self, scripts: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
         """Analyze multiple scripts concurrently."""
-        tasks = {
-            script_id: self.analyze_script_with_embedding_async(script_content)
-            for script_id, script_content in scripts.items()
-        }
+        outcomes = await asyncio.gather(
+            *(self.analyze_script_with_embedding_async(content) for content in scripts.values()),
+            return_exceptions=True
+        )
         
         results = {}
-        for script_id, task in tasks.items():
-            try:
-                results[script_id] = await task
-            except Exception as e:
-                logger.error(f"Error analyzing script {script_id}: {e}")
+        for script_id, outcome in zip(scripts, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Error analyzing script {script_id}: {outcome}")
                 results[script_id] = {
-                    "error": str(e),
+                    "error": str(outcome),
                     "processed_at": int(time.time())
                 }
+            else:
+                results[script_id] = outcome
                 
         return results
     
@@ -23,7 +23,9 @@ from .topic_validator import (
     TopicCategory,
     validate_powershell_topic,
     is_script_generation_request,
-    extract_script_requirements
+    extract_script_requirements,
+    OFF_TOPIC_RESPONSE,
+    UNCLEAR_TOPIC_RESPONSE
 )
 
 from .powershell_security import (
@@ -46,6 +48,8 @@ __all__ = [
     'validate_powershell_topic',
     'is_script_generation_request',
     'extract_script_requirements',
+    'OFF_TOPIC_RESPONSE',
+    'UNCLEAR_TOPIC_RESPONSE',
 
     # Layer 2 & 3: Security scanning and output validation
     'PowerShellSecurityGuard',
@@ -11,6 +11,7 @@ while providing a good user experience.
 """
 
 import re
+from functools import lru_cache
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
@@ -40,7 +41,7 @@ class TopicValidationResult:
 
 
 # Keywords that indicate PowerShell/scripting related topics
-POWERSHELL_KEYWORDS = {
+POWERSHELL_KEYWORDS = frozenset({
     # PowerShell specific
     'powershell', 'ps1', 'pwsh', 'cmdlet', 'cmdlets', 'get-', 'set-', 'new-',
     'remove-', 'invoke-', 'out-', 'write-host', 'write-output', 'param',
@@ -81,16 +82,16 @@ POWERSHELL_KEYWORDS = {
     # Code/programming context
     'code', 'debug', 'error', 'exception', 'syntax', 'best practice',
     'optimize', 'refactor', 'test', 'unit test', 'pester', 'validate'
-}
+})
 
 # Keywords that indicate script generation requests
-SCRIPT_GENERATION_KEYWORDS = {
+SCRIPT_GENERATION_KEYWORDS = frozenset({
     'create', 'generate', 'write', 'make', 'build', 'design', 'develop',
     'help me write', 'help me create', 'can you write', 'can you create',
     'i need a script', 'i want a script', 'script that', 'script to',
     'script for', 'new script', 'custom script', 'automate this',
     'automation for', 'how to automate', 'how do i script'
-}
+})
 
 # Greeting patterns
 GREETING_PATTERNS = [
@@ -99,15 +100,72 @@ GREETING_PATTERNS = [
     r'^(thanks?|thank you|ty)[\s!?.]*$'
 ]
 
+# Explicit script generation phrasings
+SCRIPT_GENERATION_PATTERNS = [
+    r'(create|generate|write|make|build)\s+(a\s+)?(powershell\s+)?script',
+    r'script\s+(that|to|for|which)',
+    r'(i\s+)?need\s+(a\s+)?script',
+    r'can\s+you\s+(write|create|make|generate)',
+    r'help\s+(me\s+)?(write|create|make|generate)',
+    r'how\s+(to|do\s+i)\s+(write|create|make)\s+(a\s+)?script'
+]
+
 # Off-topic keywords (should redirect)
-OFF_TOPIC_KEYWORDS = {
+OFF_TOPIC_KEYWORDS = frozenset({
     'recipe', 'cooking', 'weather', 'sports', 'movie', 'music', 'game',
     'dating', 'relationship', 'medical', 'health', 'legal', 'lawyer',
     'investment', 'stock', 'crypto', 'bitcoin', 'lottery', 'gambling',
     'politics', 'election', 'religion', 'philosophy', 'astrology',
     'celebrity', 'gossip', 'fashion', 'beauty', 'makeup', 'diet',
     'exercise', 'workout', 'travel', 'vacation', 'hotel', 'flight'
-}
+})
+
+# Compiled once at import; every chat request runs these
+_WORD_RE = re.compile(r'\b[\w\-]+\b')
+_GREETING_RE = re.compile('|'.join(f'(?:{p})' for p in GREETING_PATTERNS), re.IGNORECASE)
+_SCRIPT_GENERATION_RE = re.compile('|'.join(f'(?:{p})' for p in SCRIPT_GENERATION_PATTERNS))
+
+# Category hints checked once a message is known to be on-topic
+_ANALYSIS_HINTS = ('analyze', 'review', 'check', 'explain')
+_DEVOPS_HINTS = ('azure', 'aws', 'docker', 'kubernetes', 'ci/cd')
+_LANGUAGE_HINTS = ('bash', 'shell', 'python', 'cmd', 'batch')
+_SYSADMIN_HINTS = ('server', 'admin', 'system', 'registry', 'service')
+
+# Script requirement hints, scanned for every generation request
+_LINUX_HINTS = ('linux', 'ubuntu', 'centos', 'redhat', 'bash')
+_MACOS_HINTS = ('mac', 'macos', 'osx', 'darwin')
+_CROSS_PLATFORM_HINTS = ('cross-platform', 'cross platform', 'pwsh')
+_SIMPLE_HINTS = ('simple', 'basic', 'quick', 'easy')
+_COMPLEX_HINTS = ('complex', 'advanced', 'comprehensive', 'full')
+_FEATURE_KEYWORDS = (
+    'error handling', 'logging', 'progress', 'verbose', 'parameters',
+    'help', 'documentation', 'validation', 'retry', 'parallel',
+    'async', 'remote', 'credential', 'secure', 'encrypted'
+)
+
+# Fixed guidance returned instead of a model answer; built once so every
+# rejected request hands back the same string object
+OFF_TOPIC_RESPONSE = """I'm PSScript AI, specialized in PowerShell and scripting topics. I can help you with:
+
+- **PowerShell scripting** - Writing, debugging, and optimizing scripts
+- **Script analysis** - Security reviews, code quality checks
+- **Automation** - DevOps, CI/CD, scheduled tasks
+- **System administration** - Active Directory, Windows Server, services
+- **Script generation** - Creating new PowerShell scripts from requirements
+
+What PowerShell or scripting challenge can I help you with today?"""
+
+UNCLEAR_TOPIC_RESPONSE = """I'm PSScript AI, your PowerShell scripting assistant. I didn't quite understand how your request relates to PowerShell or scripting.
+
+Here's what I can help you with:
+
+- **Write scripts** - "Create a PowerShell script that backs up files to Azure"
+- **Debug code** - "Why is my Get-ChildItem command not working?"
+- **Explain concepts** - "How do parameters work in PowerShell functions?"
+- **Review scripts** - "Can you analyze this script for security issues?"
+- **Automate tasks** - "How do I schedule a PowerShell script?"
+
+Could you rephrase your question with more PowerShell context?"""
 
 
 def _normalize_text(text: str) -> str:
@@ -115,13 +173,17 @@ def _normalize_text(text: str) -> str:
     return text.lower().strip()
 
 
-def _check_keywords(text: str, keywords: set) -> Tuple[bool, float]:
+@lru_cache(maxsize=64)
+def _check_keywords(text: str, keywords: frozenset) -> Tuple[bool, float]:
     """
     Check if text contains any keywords from the set.
     Returns (match_found, confidence_score).
+
+    Cached because a single validation checks the same message against the
+    same keyword set more than once.
     """
     normalized = _normalize_text(text)
-    words = set(re.findall(r'\b[\w\-]+\b', normalized))
+    words = set(_WORD_RE.findall(normalized))
 
     # Check for exact matches
     matches = words & keywords
@@ -162,18 +224,7 @@ def is_script_generation_request(text: str) -> bool:
     has_script_context, _ = _check_keywords(normalized, POWERSHELL_KEYWORDS)
 
     # Also check for explicit patterns
-    generation_patterns = [
-        r'(create|generate|write|make|build)\s+(a\s+)?(powershell\s+)?script',
-        r'script\s+(that|to|for|which)',
-        r'(i\s+)?need\s+(a\s+)?script',
-        r'can\s+you\s+(write|create|make|generate)',
-        r'help\s+(me\s+)?(write|create|make|generate)',
-        r'how\s+(to|do\s+i)\s+(write|create|make)\s+(a\s+)?script'
-    ]
-
-    has_explicit_pattern = any(
-        re.search(pattern, normalized) for pattern in generation_patterns
-    )
+    has_explicit_pattern = _SCRIPT_GENERATION_RE.search(normalized) is not None
 
     return has_explicit_pattern or (has_generation_keyword and has_script_context)
 
@@ -198,28 +249,22 @@ def extract_script_requirements(text: str) -> Dict[str, any]:
     normalized = _normalize_text(text)
 
     # Detect target system
-    if any(kw in normalized for kw in ['linux', 'ubuntu', 'centos', 'redhat', 'bash']):
+    if any(kw in normalized for kw in _LINUX_HINTS):
         requirements['target_system'] = 'linux'
-    elif any(kw in normalized for kw in ['mac', 'macos', 'osx', 'darwin']):
+    elif any(kw in normalized for kw in _MACOS_HINTS):
         requirements['target_system'] = 'macos'
-    elif any(kw in normalized for kw in ['cross-platform', 'cross platform', 'pwsh']):
+    elif any(kw in normalized for kw in _CROSS_PLATFORM_HINTS):
         requirements['target_system'] = 'cross-platform'
 
     # Detect complexity hints
-    if any(kw in normalized for kw in ['simple', 'basic', 'quick', 'easy']):
+    if any(kw in normalized for kw in _SIMPLE_HINTS):
         requirements['complexity'] = 'simple'
-    elif any(kw in normalized for kw in ['complex', 'advanced', 'comprehensive', 'full']):
+    elif any(kw in normalized for kw in _COMPLEX_HINTS):
         requirements['complexity'] = 'complex'
 
     # Extract feature keywords
-    feature_keywords = [
-        'error handling', 'logging', 'progress', 'verbose', 'parameters',
-        'help', 'documentation', 'validation', 'retry', 'parallel',
-        'async', 'remote', 'credential', 'secure', 'encrypted'
-    ]
-
     requirements['features'] = [
-        kw for kw in feature_keywords if kw in normalized
+        kw for kw in _FEATURE_KEYWORDS if kw in normalized
     ]
 
     return requirements
@@ -248,7 +293,7 @@ def validate_powershell_topic(
     normalized = _normalize_text(user_message)
 
     # Layer 1: Check for greetings (always valid)
-    if _check_patterns(user_message, GREETING_PATTERNS):
+    if _GREETING_RE.match(normalized):
         return TopicValidationResult(
             is_valid=True,
             category=TopicCategory.GENERAL_GREETING,
@@ -258,7 +303,6 @@ def validate_powershell_topic(
 
     # Layer 2: Check for script generation requests (high priority)
     if is_script_generation_request(user_message):
-        extract_script_requirements(user_message)
         return TopicValidationResult(
             is_valid=True,
             category=TopicCategory.SCRIPT_GENERATION,
@@ -274,13 +318,13 @@ def validate_powershell_topic(
         # Determine specific category
         category = TopicCategory.POWERSHELL_SCRIPTING
 
-        if any(kw in normalized for kw in ['analyze', 'review', 'check', 'explain']):
+        if any(kw in normalized for kw in _ANALYSIS_HINTS):
             category = TopicCategory.SCRIPT_ANALYSIS
-        elif any(kw in normalized for kw in ['azure', 'aws', 'docker', 'kubernetes', 'ci/cd']):
+        elif any(kw in normalized for kw in _DEVOPS_HINTS):
             category = TopicCategory.DEVOPS_AUTOMATION
-        elif any(kw in normalized for kw in ['bash', 'shell', 'python', 'cmd', 'batch']):
+        elif any(kw in normalized for kw in _LANGUAGE_HINTS):
             category = TopicCategory.SCRIPTING_LANGUAGES
-        elif any(kw in normalized for kw in ['server', 'admin', 'system', 'registry', 'service']):
+        elif any(kw in normalized for kw in _SYSADMIN_HINTS):
             category = TopicCategory.SYSTEM_ADMINISTRATION
 
         return TopicValidationResult(
@@ -299,15 +343,7 @@ def validate_powershell_topic(
             category=TopicCategory.OFF_TOPIC,
             confidence=off_topic_confidence,
             message="Off-topic request detected",
-            suggested_response="""I'm PSScript AI, specialized in PowerShell and scripting topics. I can help you with:
-
-- **PowerShell scripting** - Writing, debugging, and optimizing scripts
-- **Script analysis** - Security reviews, code quality checks
-- **Automation** - DevOps, CI/CD, scheduled tasks
-- **System administration** - Active Directory, Windows Server, services
-- **Script generation** - Creating new PowerShell scripts from requirements
-
-What PowerShell or scripting challenge can I help you with today?"""
+            suggested_response=OFF_TOPIC_RESPONSE
         )
 
     # Layer 5: Check conversation context if available
@@ -350,17 +386,7 @@ What PowerShell or scripting challenge can I help you with today?"""
         category=TopicCategory.OFF_TOPIC,
         confidence=0.6,
         message="Could not determine PowerShell/scripting relevance",
-        suggested_response="""I'm PSScript AI, your PowerShell scripting assistant. I didn't quite understand how your request relates to PowerShell or scripting.
-
-Here's what I can help you with:
-
-- **Write scripts** - "Create a PowerShell script that backs up files to Azure"
-- **Debug code** - "Why is my Get-ChildItem command not working?"
-- **Explain concepts** - "How do parameters work in PowerShell functions?"
-- **Review scripts** - "Can you analyze this script for security issues?"
-- **Automate tasks** - "How do I schedule a PowerShell script?"
-
-Could you rephrase your question with more PowerShell context?"""
+        suggested_response=UNCLEAR_TOPIC_RESPONSE
     )
 
 
@@ -3,11 +3,27 @@ LangGraph API Endpoints
 
 FastAPI endpoints for the LangGraph 1.0 production orchestrator.
 Provides REST API access to PowerShell script analysis using LangGraph workflows.
+
+Deployment note: these routes are dominated by event-loop scheduling (SSE
+streaming, gathered LLM calls, checkpointer I/O), so the service should run on
+uvloop with the httptools parser:
+
+    uvicorn main:app --loop uvloop --http httptools --workers N
+
+uvicorn selects both automatically when they are installed. The router logs a
+warning on first use if it finds itself on the stock asyncio loop.
 """
 
+import asyncio
+import hashlib
 import logging
-import json
-from typing import Dict, Any, Optional, List, AsyncIterator
+import math
+import time
+import uuid
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+import anyio
+import orjson
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Body
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel, Field
@@ -21,14 +37,138 @@ logger = logging.getLogger("langgraph_endpoints")
 # Create router
 router = APIRouter(prefix="/langgraph", tags=["LangGraph"])
 
+# SSE frame encoding: one constant option set and default hook shared by
+# every frame instead of rebuilding encoder state per event.
+_OPT = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> str:
+    """Fallback for values orjson can't serialize natively (e.g. LangChain messages)."""
+    return str(obj)
+
+
 # Global orchestrator instance (initialized lazily)
 _orchestrator: Optional[LangGraphProductionOrchestrator] = None
 
+# Fixed probe script for /test; analyzed once under a stable thread ID so
+# later calls are served from the checkpointer instead of re-running the LLM.
+_TEST_SCRIPT = """
+# Simple PowerShell script
+param(
+    [Parameter(Mandatory=$true)]
+    [string]$Path
+)
+
+Get-ChildItem -Path $Path -Recurse |
+    Where-Object { $_.Extension -eq '.log' } |
+    Select-Object Name, Length, LastWriteTime
+"""
+_TEST_THREAD_ID = "sha:test-v1"
+# Thread the probe currently lives on; moves off _TEST_THREAD_ID only when a
+# failed run's state can't be deleted from the checkpointer
+_test_thread_id = _TEST_THREAD_ID
+
+# Batches larger than this are analyzed after the response is sent; the
+# client gets a job handle and polls GET /langgraph/batch-analyze/{job_id}.
+_BATCH_THRESHOLD = 5
+
+# Background batch jobs: job_id -> {"total", "done", "errors", "finished_at"}.
+# Results themselves live in the checkpointer under thread "batch:{job_id}:{index}".
+_BATCH_JOBS: Dict[str, Dict[str, Any]] = {}
+
+# Finished jobs (and their checkpoints) are dropped this long after completion
+_BATCH_JOB_TTL = 3600  # seconds
+
+# Scripts analyzed at once across all background batch jobs, so a large
+# batch queues its LLM runs instead of firing every one of them together
+_BATCH_CONCURRENCY = 4
+_batch_slots = asyncio.Semaphore(_BATCH_CONCURRENCY)
+
+
+def _check_event_loop() -> None:
+    """Warn if the router is served from the default asyncio event loop."""
+    loop_module = type(asyncio.get_running_loop()).__module__
+    if not loop_module.startswith("uvloop"):
+        logger.warning(
+            "LangGraph router is running on the %s event loop; install uvloop "
+            "and httptools (or start uvicorn with --loop uvloop --http httptools) "
+            "for streaming throughput",
+            loop_module
+        )
+
+
+class _StreamRun:
+    """
+    An in-flight streaming analysis shared by every subscriber to its thread.
+
+    The run is cancelled once its last subscriber leaves, so an abandoned
+    stream stops spending LLM calls instead of running to completion.
+    """
+
+    def __init__(self, fingerprint: bytes) -> None:
+        # Digest of the request inputs; only identical requests may attach
+        self.fingerprint = fingerprint
+        self.events: List[Dict[str, Any]] = []
+        self.subscribers: List[MemoryObjectSendStream] = []
+        self.done = False
+        self.task: Optional[asyncio.Task] = None
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """Buffer an event and fan it out to live subscribers."""
+        self.events.append(event)
+        for send in list(self.subscribers):
+            try:
+                send.send_nowait(event)
+            except (anyio.BrokenResourceError, anyio.ClosedResourceError):
+                # Subscriber disconnected; the run keeps going for the others
+                self.unsubscribe(send)
+
+    def subscribe(self) -> Tuple[MemoryObjectSendStream, MemoryObjectReceiveStream]:
+        """Attach a subscriber, replaying every event buffered so far."""
+        send, receive = anyio.create_memory_object_stream(max_buffer_size=math.inf)
+        for event in self.events:
+            send.send_nowait(event)
+        if self.done:
+            send.close()
+        else:
+            self.subscribers.append(send)
+        return send, receive
+
+    def unsubscribe(self, send: MemoryObjectSendStream) -> None:
+        """Detach a subscriber; cancel the run when nobody is left to receive it."""
+        if send in self.subscribers:
+            self.subscribers.remove(send)
+        send.close()
+        if not self.subscribers and not self.done and self.task is not None:
+            self.task.cancel()
+
+    def close(self) -> None:
+        self.done = True
+        for send in self.subscribers:
+            send.close()
+        self.subscribers.clear()
+
+
+# In-flight streaming runs keyed by thread_id, so a retry or UI reconnect on
+# the same thread attaches to the running workflow instead of starting another.
+_RUNS: Dict[str, _StreamRun] = {}
+
+
+def _request_fingerprint(request: "LangGraphAnalysisRequest") -> bytes:
+    """Digest of the inputs a streaming run depends on."""
+    return hashlib.sha256(orjson.dumps([
+        request.script_content,
+        request.require_human_review,
+        request.model,
+        request.api_key
+    ])).digest()
+
 
 def get_orchestrator(api_key: Optional[str] = None) -> LangGraphProductionOrchestrator:
     """Get or create the global orchestrator instance."""
     global _orchestrator
     if _orchestrator is None:
+        _check_event_loop()
         _orchestrator = LangGraphProductionOrchestrator(api_key=api_key)
     return _orchestrator
 
@@ -98,56 +238,58 @@ async def analyze_script(request: LangGraphAnalysisRequest):
     ```
 
     **Returns:**
-    - If streaming: Server-Sent Events stream with real-time updates
+    - If streaming: Server-Sent Events stream with real-time updates. Concurrent
+      streaming requests for the same `thread_id` share one workflow run; late
+      subscribers receive the events emitted so far, then the live stream. A
+      request for a busy `thread_id` with different inputs gets 409. The run is
+      cancelled when every subscriber has disconnected.
     - If not streaming: Complete analysis results with security findings, quality metrics, and recommendations
     """
     try:
-        logger.info(f"Received LangGraph analysis request (stream={request.stream}) for thread_id: {request.thread_id}")
+        logger.info(
+            "Received LangGraph analysis request (stream=%s) for thread_id: %s",
+            request.stream, request.thread_id
+        )
 
         # Get orchestrator
         orchestrator = get_orchestrator(api_key=request.api_key)
 
         # Handle streaming mode
         if request.stream:
-            async def event_generator() -> AsyncIterator[str]:
+            thread_id = request.thread_id
+            fingerprint = _request_fingerprint(request)
+            run = _RUNS.get(thread_id) if thread_id else None
+
+            if run is None:
+                run = _StreamRun(fingerprint)
+                if thread_id:
+                    _RUNS[thread_id] = run
+                run.task = asyncio.create_task(_produce_stream(run, orchestrator, request))
+            elif run.fingerprint != fingerprint:
+                # A second workflow on the same thread would interleave checkpoints
+                raise HTTPException(
+                    status_code=409,
+                    detail="A different analysis is already streaming on this thread_id"
+                )
+            else:
+                logger.info("Attaching to in-flight stream for thread_id: %s", thread_id)
+
+            send, receive = run.subscribe()
+
+            async def event_generator() -> AsyncIterator[bytes]:
                 """Generate SSE events for streaming analysis."""
+                dumps = orjson.dumps
+
                 try:
                     # Send connection event
-                    yield f"data: {json.dumps({'type': 'connected', 'message': 'Stream started'})}\n\n"
-
-                    # Call orchestrator with streaming enabled
-                    # The orchestrator's analyze_script method returns events when stream=True
-                    result = await orchestrator.analyze_script(
-                        script_content=request.script_content,
-                        thread_id=request.thread_id,
-                        require_human_review=request.require_human_review,
-                        stream=True
-                    )
-
-                    # Stream the events from the orchestrator
-                    # The orchestrator should yield events from the LangGraph workflow
-                    if hasattr(result, '__aiter__'):
-                        # If result is an async iterator, stream it
-                        async for event in result:
-                            event_data = {
-                                'type': 'workflow_event',
-                                'data': event
-                            }
-                            yield f"data: {json.dumps(event_data)}\n\n"
-                    else:
-                        # If result is a dict (non-streaming fallback), send as single event
-                        yield f"data: {json.dumps({'type': 'completed', 'data': result})}\n\n"
-
-                    # Send completion event
-                    yield f"data: {json.dumps({'type': 'completed', 'message': 'Analysis complete'})}\n\n"
-
-                except Exception as e:
-                    logger.error(f"Streaming error: {e}", exc_info=True)
-                    error_event = {
-                        'type': 'error',
-                        'message': str(e)
-                    }
-                    yield f"data: {json.dumps(error_event)}\n\n"
+                    yield b"data: " + dumps({'type': 'connected', 'message': 'Stream started'}) + b"\n\n"
+
+                    async with receive:
+                        async for event in receive:
+                            yield b"data: " + dumps(event, default=_default, option=_OPT) + b"\n\n"
+                finally:
+                    # Runs on client disconnect too; the last one out stops the run
+                    run.unsubscribe(send)
 
             return StreamingResponse(
                 event_generator(),
@@ -155,7 +297,8 @@ async def analyze_script(request: LangGraphAnalysisRequest):
                 headers={
                     "Cache-Control": "no-cache",
                     "Connection": "keep-alive",
-                    "X-Accel-Buffering": "no"
+                    "X-Accel-Buffering": "no",
+                    "Content-Encoding": "identity"  # Keep GZipMiddleware from buffering frames
                 }
             )
 
@@ -167,18 +310,58 @@ async def analyze_script(request: LangGraphAnalysisRequest):
             stream=False
         )
 
-        logger.info(f"Analysis completed for workflow: {result.get('workflow_id')}")
+        logger.info("Analysis completed for workflow: %s", result.get("workflow_id"))
 
         return JSONResponse(content=result)
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in analyze_script: {e}", exc_info=True)
+        logger.error("Error in analyze_script: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Script analysis failed: {str(e)}"
         )
 
 
+async def _produce_stream(
+    run: _StreamRun,
+    orchestrator: LangGraphProductionOrchestrator,
+    request: LangGraphAnalysisRequest
+) -> None:
+    """Drive one streaming analysis and tee its events to all subscribers."""
+    try:
+        # The orchestrator's analyze_script method returns events when stream=True
+        result = await orchestrator.analyze_script(
+            script_content=request.script_content,
+            thread_id=request.thread_id,
+            require_human_review=request.require_human_review,
+            stream=True
+        )
+
+        if hasattr(result, '__aiter__'):
+            async for event in result:
+                run.publish({'type': 'workflow_event', 'data': event})
+        else:
+            # If result is a dict (non-streaming fallback), send as single event
+            run.publish({'type': 'completed', 'data': result})
+
+        run.publish({'type': 'completed', 'message': 'Analysis complete'})
+
+    except asyncio.CancelledError:
+        logger.info("Streaming run for thread_id %s cancelled: no subscribers left", request.thread_id)
+        raise
+
+    except Exception as e:
+        logger.error("Streaming error: %s", e, exc_info=True)
+        run.publish({'type': 'error', 'message': str(e)})
+
+    finally:
+        run.close()
+        if request.thread_id and _RUNS.get(request.thread_id) is run:
+            del _RUNS[request.thread_id]
+
+
 @router.post("/feedback", response_model=LangGraphAnalysisResponse)
 async def provide_human_feedback(request: HumanFeedbackRequest):
     """
@@ -199,7 +382,7 @@ async def provide_human_feedback(request: HumanFeedbackRequest):
     - Updated analysis results after incorporating human feedback
     """
     try:
-        logger.info(f"Received human feedback for thread: {request.thread_id}")
+        logger.info("Received human feedback for thread: %s", request.thread_id)
 
         # Get orchestrator
         orchestrator = get_orchestrator()
@@ -210,12 +393,12 @@ async def provide_human_feedback(request: HumanFeedbackRequest):
             human_feedback=request.feedback
         )
 
-        logger.info(f"Workflow continued for: {request.thread_id}")
+        logger.info("Workflow continued for: %s", request.thread_id)
 
         return LangGraphAnalysisResponse(**result)
 
     except Exception as e:
-        logger.error(f"Error in provide_human_feedback: {e}", exc_info=True)
+        logger.error("Error in provide_human_feedback: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process feedback: {str(e)}"
@@ -248,7 +431,7 @@ async def health_check():
         }
 
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         return {
             "status": "unhealthy",
             "error": str(e)
@@ -345,8 +528,10 @@ async def batch_analyze_scripts(
     This endpoint accepts multiple scripts and processes them concurrently
     using the LangGraph orchestrator.
 
-    **Note:** For large batches, consider using background tasks or
-    a job queue system.
+    Batches of more than five scripts are run as a background job: the
+    endpoint responds with 202 Accepted and a `job_id`/`status_url` that can
+    be polled for per-script results for an hour after the job finishes.
+    Background jobs analyze at most four scripts at a time.
 
     **Example Request:**
     ```json
@@ -359,12 +544,32 @@ async def batch_analyze_scripts(
     ```
     """
     try:
-        logger.info(f"Received batch analysis request for {len(scripts)} scripts")
+        logger.info("Received batch analysis request for %d scripts", len(scripts))
 
         orchestrator = get_orchestrator()
 
+        # Large batches: don't hold the HTTP request open for every LLM run
+        if len(scripts) > _BATCH_THRESHOLD and background_tasks is not None:
+            await _evict_batch_jobs()
+
+            job_id = uuid.uuid4().hex
+            _BATCH_JOBS[job_id] = {
+                "total": len(scripts), "done": False, "errors": {}, "finished_at": None
+            }
+            background_tasks.add_task(_run_batch, job_id, scripts)
+
+            logger.info("Scheduled batch job %s for %d scripts", job_id, len(scripts))
+
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "job_id": job_id,
+                    "total": len(scripts),
+                    "status_url": f"{router.prefix}/batch-analyze/{job_id}"
+                }
+            )
+
         # Process scripts concurrently
-        import asyncio
         tasks = [
             orchestrator.analyze_script(script_content=script)
             for script in scripts
@@ -398,13 +603,97 @@ async def batch_analyze_scripts(
         }
 
     except Exception as e:
-        logger.error(f"Batch analysis failed: {e}", exc_info=True)
+        logger.error("Batch analysis failed: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Batch analysis failed: {str(e)}"
         )
 
 
+async def _evict_batch_jobs() -> None:
+    """Forget batch jobs that finished more than _BATCH_JOB_TTL ago, checkpoints included."""
+    cutoff = time.monotonic() - _BATCH_JOB_TTL
+    expired = [
+        job_id for job_id, job in _BATCH_JOBS.items()
+        if job["done"] and job["finished_at"] < cutoff
+    ]
+    if not expired:
+        return
+
+    orchestrator = get_orchestrator()
+    for job_id in expired:
+        job = _BATCH_JOBS.pop(job_id)
+        for idx in range(job["total"]):
+            await orchestrator.delete_workflow_state(f"batch:{job_id}:{idx}")
+    logger.info("Evicted %d expired batch job(s)", len(expired))
+
+
+async def _run_batch(job_id: str, scripts: List[str]) -> None:
+    """Analyze a batch in the background, checkpointing each script under its own thread."""
+    orchestrator = get_orchestrator()
+    job = _BATCH_JOBS[job_id]
+
+    async def analyze(idx: int, script: str) -> Dict[str, Any]:
+        async with _batch_slots:
+            return await orchestrator.analyze_script(
+                script_content=script,
+                thread_id=f"batch:{job_id}:{idx}"
+            )
+
+    results = await asyncio.gather(
+        *(analyze(idx, script) for idx, script in enumerate(scripts)),
+        return_exceptions=True
+    )
+
+    for idx, result in enumerate(results):
+        if isinstance(result, Exception):
+            job["errors"][idx] = str(result)
+        elif result.get("status") == "failed":
+            job["errors"][idx] = result.get("error", "Analysis failed")
+
+    job["done"] = True
+    job["finished_at"] = time.monotonic()
+    logger.info("Batch job %s finished (%d failed)", job_id, len(job["errors"]))
+
+
+@router.get("/batch-analyze/{job_id}", tags=["Batch"])
+async def get_batch_status(job_id: str):
+    """
+    Get the status of a background batch analysis job.
+
+    Returns the checkpointed workflow state for each script in the batch;
+    scripts that have not reached a checkpoint yet are reported as pending.
+    Jobs are kept for an hour after they finish.
+    """
+    await _evict_batch_jobs()
+
+    job = _BATCH_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Batch job not found: {job_id}")
+
+    orchestrator = get_orchestrator()
+
+    results = []
+    for idx in range(job["total"]):
+        if idx in job["errors"]:
+            results.append({"index": idx, "status": "failed", "error": job["errors"][idx]})
+            continue
+
+        state = await orchestrator.get_workflow_state(f"batch:{job_id}:{idx}")
+        if state is None:
+            results.append({"index": idx, "status": "pending"})
+        else:
+            results.append({"index": idx, **state})
+
+    return {
+        "job_id": job_id,
+        "status": "completed" if job["done"] else "in_progress",
+        "total": job["total"],
+        "failed": len(job["errors"]),
+        "results": results
+    }
+
+
 # ============================================================================
 # Utility Endpoints
 # ============================================================================
@@ -415,22 +704,25 @@ async def test_orchestrator():
     Test the LangGraph orchestrator with a simple example script.
 
     Useful for verifying that the orchestrator is working correctly.
+    The first call primes the checkpointer; later calls return the
+    checkpointed result without re-running the workflow.
     """
+    global _test_thread_id
+
     try:
-        test_script = """
-        # Simple PowerShell script
-        param(
-            [Parameter(Mandatory=$true)]
-            [string]$Path
-        )
+        orchestrator = get_orchestrator()
 
-        Get-ChildItem -Path $Path -Recurse |
-            Where-Object { $_.Extension -eq '.log' } |
-            Select-Object Name, Length, LastWriteTime
-        """
+        result = await orchestrator.get_workflow_state(_test_thread_id)
+        if not result or result.get("status") != "completed":
+            # add_messages appends, so re-running on a failed probe's thread
+            # would grow its history on every retry; start from a clean thread
+            if result and not await orchestrator.delete_workflow_state(_test_thread_id):
+                _test_thread_id = f"{_TEST_THREAD_ID}:{uuid.uuid4().hex}"
 
-        orchestrator = get_orchestrator()
-        result = await orchestrator.analyze_script(script_content=test_script)
+            result = await orchestrator.analyze_script(
+                script_content=_TEST_SCRIPT,
+                thread_id=_test_thread_id
+            )
 
         return {
             "test_status": "passed",
@@ -438,7 +730,7 @@ async def test_orchestrator():
         }
 
     except Exception as e:
-        logger.error(f"Test failed: {e}", exc_info=True)
+        logger.error("Test failed: %s", e, exc_info=True)
         return {
             "test_status": "failed",
             "error": str(e)
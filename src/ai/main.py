@@ -7,10 +7,19 @@ Uses psycopg3 async connection pooling and LangGraph 1.0 agents.
 
 import os
 import re
-import json
+import base64
+import asyncio
 import time
+import uuid
+import hashlib
+import importlib.util
+import itertools
 import logging
-from typing import Dict, List, Literal, Optional, Any
+import threading
+from functools import cache, partial
+from types import MappingProxyType
+from collections import OrderedDict
+from typing import Annotated, AsyncIterator, Awaitable, Callable, Dict, List, Literal, Optional, Tuple, Type, TypeVar, Any
 from contextlib import asynccontextmanager
 from pathlib import Path
 from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
@@ -21,25 +30,34 @@ env_path = Path(__file__).resolve().parent.parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 logging.info(f"Loaded environment from: {env_path}")
 
-from fastapi import FastAPI, HTTPException, Header, Query
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Header, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
+from pydantic import ValidationError as PydanticValidationError
 import numpy as np
+import orjson
 
 # psycopg3 for async connection pooling (2026 best practice)
 try:
     from psycopg_pool import AsyncConnectionPool
-    from psycopg.rows import dict_row  # noqa: F401 - Reserved for future use
+    from psycopg.rows import dict_row, tuple_row
+    from psycopg.types.json import Jsonb, set_json_dumps
     PSYCOPG3_AVAILABLE = True
 except ImportError:
     AsyncConnectionPool = Any  # type: ignore[misc,assignment]
     PSYCOPG3_AVAILABLE = False
     logging.warning("psycopg3 not available, falling back to psycopg2")
 
-# Fallback to psycopg2 for compatibility
-import psycopg2
-from psycopg2.extras import RealDictCursor
+try:
+    from pgvector.psycopg import register_vector_async
+except ImportError:
+    register_vector_async = None
 
 from voice_endpoints import router as voice_router
 from langgraph_endpoints import router as langgraph_router
@@ -56,6 +74,8 @@ from guardrails import (
     validate_powershell_topic,
     is_script_generation_request,
     extract_script_requirements,
+    OFF_TOPIC_RESPONSE,
+    UNCLEAR_TOPIC_RESPONSE,
     # Layer 2 & 3: Security guardrails
     PowerShellSecurityGuard,
     scan_powershell_code,
@@ -67,10 +87,16 @@ from guardrails import (
 # Import our agent system
 from agents.agent_coordinator import AgentCoordinator
 from agents.agent_factory import agent_factory
+try:
+    from agents.openai_assistant_agent import OpenAIAssistantAgent
+except ImportError:  # agent_type="assistant" falls back to the agent factory
+    OpenAIAssistantAgent = None
 from analysis.script_analyzer import ScriptAnalyzer
+from analysis.categories import CATEGORIES, CATEGORY_IDS, DEFAULT_CATEGORY_ID
 # Import utilities
-from utils.token_counter import token_counter, estimate_tokens
+from utils.token_counter import token_counter, estimate_tokens, load_tokenizer
 from utils.api_key_manager import api_key_manager, ensure_api_key
+from utils.semantic_cache import analysis_cache, chat_cache, script_cache
 # Import error handling and logging
 from utils.error_handler import (
     PSScriptError,
@@ -165,8 +191,14 @@ def get_db_conninfo() -> str:
     raise RuntimeError("DATABASE_URL must point at hosted Supabase Postgres.")
 
 
+@cache
 def get_database_url() -> Optional[str]:
-    """Return DATABASE_URL with SSL enabled for hosted Supabase connections."""
+    """
+    Return DATABASE_URL with SSL enabled for hosted Supabase connections.
+
+    The environment is fixed for the life of the process, so the URL is parsed
+    and validated once; a misconfigured URL still raises on every call.
+    """
     database_url = os.getenv("DATABASE_URL")
     if not database_url:
         return None
@@ -189,6 +221,42 @@ def get_database_url() -> Optional[str]:
     return urlunparse(parsed._replace(query=urlencode(params)))
 
 
+def use_prepared_statements() -> bool:
+    """
+    Whether pooled connections may use server-side prepared statements.
+
+    The Supabase transaction pooler (port 6543) hands each transaction to a
+    different backend, so statements prepared on one backend are unknown on
+    the next. Prepare only on direct/session connections unless overridden
+    with DB_PREPARED_STATEMENTS=true|false.
+    """
+    override = os.getenv("DB_PREPARED_STATEMENTS", "").lower()
+    if override in ("true", "false"):
+        return override == "true"
+
+    database_url = os.getenv("DATABASE_URL") or ""
+    parsed = urlparse(database_url)
+    params = dict(parse_qsl(parsed.query, keep_blank_values=True))
+    return parsed.port != 6543 and params.get("pgbouncer", "").lower() != "true"
+
+
+PREPARE_STATEMENTS = use_prepared_statements()
+
+
+async def configure_db_connection(conn) -> None:
+    """Per-connection setup for pooled connections: UTC session, pgvector type."""
+    await conn.execute("SET timezone TO 'UTC'")
+    await conn.commit()
+    if register_vector_async is None:
+        return
+    try:
+        await register_vector_async(conn)
+        await conn.commit()
+    except Exception:
+        # vector extension not installed; embeddings stay as text
+        await conn.rollback()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -196,26 +264,79 @@ async def lifespan(app: FastAPI):
 
     This is the 2026 best practice for connection pool lifecycle management.
     """
-    global db_pool, agent_coordinator
+    global db_pool, agent_coordinator, PGVECTOR_VERSION, VECTOR_ENABLED, HALFVEC_ENABLED
 
     # Startup: Initialize resources
     logger.info("Starting up PowerShell Script Analysis API...")
+    # uvicorn's "auto" loop picks uvloop when installed; make the choice visible
+    # since it is easy to lose (e.g. a deploy without the requirements extras)
+    loop_type = type(asyncio.get_running_loop())
+    logger.info(f"Event loop: {loop_type.__module__}.{loop_type.__qualname__}")
+    if not loop_type.__module__.startswith("uvloop") or importlib.util.find_spec("httptools") is None:
+        # Small responses (/api/key/status, /categories, /health) are mostly
+        # loop and parser overhead, so this costs every endpoint
+        logger.warning(
+            "Serving without uvloop and/or httptools; install requirements.txt "
+            "(uvicorn picks both up automatically) to cut per-request dispatch cost"
+        )
 
     # Initialize psycopg3 async connection pool
     if PSYCOPG3_AVAILABLE:
         try:
             db_pool = AsyncConnectionPool(
                 conninfo=get_db_conninfo(),
-                min_size=2,
-                max_size=10,
+                # Per worker process: workers x max_size must fit the database limit
+                min_size=int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+                max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                # Bound checkout waits so a saturated pool fails fast instead
+                # of queueing requests indefinitely
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", "2.0")),
+                max_idle=600,  # close connections idle for 10 minutes
+                max_lifetime=3600,  # recycle connections hourly
+                kwargs={
+                    "row_factory": dict_row,
+                    # None disables psycopg's automatic preparation entirely
+                    "prepare_threshold": 5 if PREPARE_STATEMENTS else None
+                },
+                configure=configure_db_connection,
                 open=False  # 2026 best practice: create with open=False
             )
             await db_pool.open()
+            # Connect and configure min_size connections now, so the first
+            # requests don't pay the TCP/TLS handshake and type registration
+            await db_pool.wait(timeout=float(os.getenv("DB_POOL_WARMUP_TIMEOUT", "10")))
             logger.info("Async database connection pool initialized (psycopg3)")
         except Exception as e:
             logger.warning(f"Failed to initialize psycopg3 pool: {e}")
+            if db_pool:
+                # Stop the pool's reconnect workers before falling back
+                await db_pool.close()
             db_pool = None
 
+    # Probe pgvector once per worker, through the pool when it is available
+    PGVECTOR_VERSION, halfvec_index = await get_pgvector_status_async()
+    VECTOR_ENABLED = PGVECTOR_VERSION is not None
+    # Rank on the halfvec expression only when its HNSW index exists; without
+    # it every /similar query would be a sequential scan, while the plain
+    # distance is still served by idx_script_embeddings_hnsw
+    HALFVEC_ENABLED = supports_halfvec(PGVECTOR_VERSION) and halfvec_index
+    if supports_halfvec(PGVECTOR_VERSION) and not halfvec_index:
+        logger.warning(
+            "pgvector supports halfvec but idx_script_embeddings_hnsw_halfvec is missing; "
+            "apply 20261016_script_embeddings_halfvec_index.sql to enable half-precision ranking"
+        )
+    # Also published on app.state for handlers and tests that hold the app
+    # rather than importing the module globals
+    app.state.pgvector_version = PGVECTOR_VERSION
+    app.state.vector_enabled = VECTOR_ENABLED
+    app.state.halfvec_enabled = HALFVEC_ENABLED
+    logger.info(f"Vector operations enabled: {VECTOR_ENABLED} (halfvec: {HALFVEC_ENABLED})")
+
+    # Building the BPE tables takes a noticeable moment (and may fetch them
+    # once); do it here rather than inside the first cost estimate
+    if not await asyncio.to_thread(load_tokenizer):
+        logger.info("tiktoken unavailable; token estimates use the length heuristic")
+
     # Initialize agent coordinator
     try:
         memory_storage_path = os.path.join(os.path.dirname(__file__), "memory_storage")
@@ -246,17 +367,52 @@ async def lifespan(app: FastAPI):
         await db_pool.close()
         logger.info("Database connection pool closed")
 
+    if _sync_pool:
+        _sync_pool.closeall()
+
     logger.info("API shutdown complete")
 
 
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+if PSYCOPG3_AVAILABLE:
+    # Jsonb parameters are encoded by orjson straight to bytes
+    set_json_dumps(partial(orjson.dumps, option=ORJSON_OPTIONS))
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (also handles numpy scores and vectors)."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
 # Initialize FastAPI app with lifespan handler
 app = FastAPI(
     title="PowerShell Script Analysis API",
     description="API for analyzing PowerShell scripts using AI (Updated January 2026)",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+
+# FastAPI's stock handlers render error bodies with the stdlib JSONResponse;
+# route them through orjson like every other response
+@app.exception_handler(StarletteHTTPException)
+async def orjson_http_exception_handler(request, exc: StarletteHTTPException):
+    headers = getattr(exc, "headers", None)
+    if exc.status_code in (204, 304) or exc.status_code < 200:
+        return Response(status_code=exc.status_code, headers=headers)
+    return ORJSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=headers)
+
+
+@app.exception_handler(RequestValidationError)
+async def orjson_validation_exception_handler(request, exc: RequestValidationError):
+    # jsonable_encoder: error contexts can carry exception instances
+    return ORJSONResponse({"detail": jsonable_encoder(exc.errors())}, status_code=422)
+
+
 # CORS Configuration - SECURITY FIX
 # Read allowed origins from environment variable
 # In development: CORS_ORIGINS="http://localhost:3000,http://localhost:4000"
@@ -290,8 +446,23 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    # Only the methods routes actually use (PUT: /preferences); preflight
+    # OPTIONS is answered by the middleware itself
+    allow_methods=["GET", "POST", "PUT"],
     allow_headers=["Authorization", "Content-Type", "X-API-Key", "X-Request-ID"],
+    # Let browsers cache preflights for a day instead of Starlette's 10 minutes,
+    # so POSTs with JSON bodies or X-API-Key stop paying an extra OPTIONS round
+    # trip (browsers clamp this: Chromium to 2h, Firefox to 24h)
+    max_age=int(os.getenv("CORS_MAX_AGE", "86400")),
+)
+
+# Compress larger JSON bodies (analysis text, chat answers, embeddings) for
+# clients that accept gzip. SSE responses set Content-Encoding: identity,
+# which the middleware passes through untouched so frames are not buffered.
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=int(os.getenv("GZIP_MIN_SIZE", "1024")),
+    compresslevel=int(os.getenv("GZIP_LEVEL", "5"))
 )
 
 # Add voice router
@@ -311,16 +482,16 @@ api_key = ensure_api_key()
 if api_key:
     config.api_keys.openai = api_key
     # Security: Don't log API key, even partially
-    print("OpenAI API key configured successfully")
+    logger.info("OpenAI API key configured")
 else:
-    print("No OpenAI API key configured")
+    logger.warning("No OpenAI API key configured")
 
-# Updated logging for April 2026
-print(f"Mock mode enabled: {MOCK_MODE}")
-print(f"Default agent: {config.agent.default_agent}")
-print(f"Default model: {config.agent.default_model} (April 26, 2026)")
-print("Token tracking: Enabled")
-print(f"Vector operations enabled: {hasattr(config, 'vector_db_enabled') and config.vector_db_enabled}")
+# One record through the queue-backed logging setup instead of a burst of
+# unbuffered stdout writes per worker; vector support is logged at startup
+logger.info(
+    "Boot: mock=%s agent=%s model=%s token_tracking=enabled",
+    MOCK_MODE, config.agent.default_agent, config.agent.default_model
+)
 
 
 # Initialize agent coordinator (will be set in lifespan)
@@ -340,13 +511,57 @@ async def get_db_connection_async():
         async with db_pool.connection() as conn:
             yield conn
     else:
-        # Fallback to synchronous psycopg2 connection
-        conn = get_db_connection_sync()
+        # Fallback to a pooled synchronous psycopg2 connection; checkout may
+        # have to connect, so it runs off the event loop
+        sync_pool = await asyncio.to_thread(get_sync_pool)
+        conn = await asyncio.to_thread(sync_pool.getconn) if sync_pool else None
         try:
             yield conn
         finally:
             if conn:
-                conn.close()
+                sync_pool.putconn(conn)
+
+
+# Process-wide psycopg2 pool for the fallback path, created on first use so
+# fallback requests reuse connections instead of reconnecting per request.
+# Callers run in asyncio.to_thread workers, so creation is serialized by a
+# lock, and a failed attempt is not retried for SYNC_POOL_RETRY_INTERVAL.
+SYNC_POOL_RETRY_INTERVAL = 30.0  # seconds
+_sync_pool = None
+_sync_pool_lock = threading.Lock()
+_sync_pool_retry_at = 0.0
+
+
+def get_sync_pool():
+    """Return the shared psycopg2 ThreadedConnectionPool, or None if it cannot be created."""
+    global _sync_pool, _sync_pool_retry_at
+
+    if _sync_pool is not None:
+        return _sync_pool
+
+    with _sync_pool_lock:
+        # Another thread may have created the pool (or just failed) while we waited
+        if _sync_pool is not None or time.monotonic() < _sync_pool_retry_at:
+            return _sync_pool
+        try:
+            database_url = get_database_url()
+            if not database_url:
+                raise RuntimeError("DATABASE_URL must point at hosted Supabase Postgres.")
+
+            from psycopg2.pool import ThreadedConnectionPool
+            from psycopg2.extras import RealDictCursor
+
+            _sync_pool = ThreadedConnectionPool(
+                minconn=2,
+                maxconn=20,
+                dsn=database_url,
+                cursor_factory=RealDictCursor
+            )
+        except Exception as e:
+            _sync_pool_retry_at = time.monotonic() + SYNC_POOL_RETRY_INTERVAL
+            logger.error(f"Database pool creation error (retrying in {SYNC_POOL_RETRY_INTERVAL:.0f}s): {e}")
+            return None
+    return _sync_pool
 
 
 def get_db_connection_sync():
@@ -354,6 +569,10 @@ def get_db_connection_sync():
     try:
         database_url = get_database_url()
         if database_url:
+            # Imported on demand: only the fallback path and startup checks need psycopg2
+            import psycopg2
+            from psycopg2.extras import RealDictCursor
+
             conn = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
             return conn
 
@@ -369,42 +588,197 @@ def get_db_connection():
     return get_db_connection_sync()
 
 
-# Check if pgvector extension is available
-def is_pgvector_available():
-    """Check if pgvector extension is available and installed."""
+# Hot statements are sent with prepare=True so the server parses and plans them
+# once per pooled connection instead of on every request.
+# The INSERT ... SELECT only yields a row when the script exists, so the FK
+# check and the upsert share one round trip. JSON columns are bound as Jsonb.
+# Re-persisting an unchanged analysis (e.g. a cached /analyze result) matches
+# no row in DO UPDATE, so it writes no new tuple or WAL and keeps updated_at.
+UPSERT_ANALYSIS_SQL = """
+    INSERT INTO script_analysis
+    (script_id, purpose, security_score, quality_score, risk_score,
+     parameter_docs, suggestions)
+    SELECT s.id, %s, %s, %s, %s, %s, %s
+    FROM scripts s
+    WHERE s.id = %s
+    ON CONFLICT (script_id) DO UPDATE SET
+        purpose = EXCLUDED.purpose,
+        security_score = EXCLUDED.security_score,
+        quality_score = EXCLUDED.quality_score,
+        risk_score = EXCLUDED.risk_score,
+        parameter_docs = EXCLUDED.parameter_docs,
+        suggestions = EXCLUDED.suggestions,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (script_analysis.purpose, script_analysis.security_score,
+           script_analysis.quality_score, script_analysis.risk_score,
+           script_analysis.parameter_docs, script_analysis.suggestions)
+        IS DISTINCT FROM
+          (EXCLUDED.purpose, EXCLUDED.security_score, EXCLUDED.quality_score,
+           EXCLUDED.risk_score, EXCLUDED.parameter_docs, EXCLUDED.suggestions)
+"""
+
+
+def _persist_analysis_sync(script_id: int, analysis: Dict[str, Any]) -> None:
+    """psycopg2 fallback for _persist_analysis; runs in a worker thread."""
+    from psycopg2.extras import Json
+
+    def dumps(value: Any) -> str:
+        # Same encoder as the Jsonb path (numpy scores included)
+        return orjson.dumps(value, option=ORJSON_OPTIONS).decode()
+
+    sync_pool = get_sync_pool()
+    if not sync_pool:
+        logger.warning("Database unavailable; analysis not persisted")
+        return
+
+    conn = sync_pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                UPSERT_ANALYSIS_SQL,
+                (
+                    analysis["purpose"],
+                    analysis["security_score"],
+                    analysis["code_quality_score"],
+                    analysis["risk_score"],
+                    Json(analysis["parameters"], dumps=dumps),
+                    Json(analysis["optimization"], dumps=dumps),
+                    script_id
+                )
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        sync_pool.putconn(conn)
+
+
+async def _persist_analysis(script_id: int, analysis: Dict[str, Any]) -> None:
+    """Upsert the script_analysis row for an existing script (runs as a background task)."""
+    try:
+        if not db_pool:
+            # Without the async pool, write through the psycopg2 pool off the loop
+            await asyncio.to_thread(_persist_analysis_sync, script_id, analysis)
+            return
+
+        async with db_pool.connection() as conn:
+            # Scripts that were never stored are skipped (no FK violation)
+            await conn.execute(
+                UPSERT_ANALYSIS_SQL,
+                (
+                    analysis["purpose"],
+                    analysis["security_score"],
+                    analysis["code_quality_score"],
+                    analysis["risk_score"],
+                    Jsonb(analysis["parameters"]),
+                    Jsonb(analysis["optimization"]),
+                    script_id
+                ),
+                prepare=PREPARE_STATEMENTS
+            )
+            # The pool commits when the connection block exits cleanly
+    except Exception as e:
+        # The response has already been sent, so failures can only be logged
+        logger.warning(f"Database error storing analysis for script {script_id}: {e}")
+
+
+# One round trip for the extension version and whether the halfvec HNSW index
+# from 20261016_script_embeddings_halfvec_index.sql has been created
+PGVECTOR_STATUS_SQL = """
+    SELECT extversion,
+           to_regclass('public.idx_script_embeddings_hnsw_halfvec') IS NOT NULL
+               AS halfvec_index
+    FROM pg_extension
+    WHERE extname = 'vector'
+"""
+
+
+# Check which pgvector extension version is installed
+def get_pgvector_status() -> Tuple[Optional[str], bool]:
+    """
+    Return the installed pgvector version (None if unavailable) and whether
+    the halfvec HNSW index exists (psycopg2).
+    """
+    # Borrow from the fallback pool the requests will use anyway, so the
+    # probe's connection is kept instead of opened and torn down
+    sync_pool = get_sync_pool()
+    if not sync_pool:
+        logger.warning("Could not connect to database to check pgvector")
+        return None, False
+
     conn = None
     try:
-        conn = get_db_connection()
-        if not conn:
-            print("Could not connect to database to check pgvector")
-            return False
-            
-        cur = conn.cursor()
-        
-        # Check if vector extension is installed
-        cur.execute("SELECT * FROM pg_extension WHERE extname = 'vector'")
-        result = cur.fetchone()
-        
-        return result is not None
+        conn = sync_pool.getconn()
+        with conn.cursor() as cur:
+            # Check if vector extension is installed
+            cur.execute(PGVECTOR_STATUS_SQL)
+            result = cur.fetchone()
+        # End the read-only transaction before the connection goes back
+        conn.rollback()
+
+        return (result["extversion"], result["halfvec_index"]) if result else (None, False)
     except Exception as e:
-        print(f"Error checking pgvector availability: {e}")
-        return False
+        logger.warning(f"Error checking pgvector availability: {e}")
+        return None, False
     finally:
         if conn:
-            conn.close()
+            sync_pool.putconn(conn)
+
+
+async def get_pgvector_status_async() -> Tuple[Optional[str], bool]:
+    """get_pgvector_status using a pooled connection when one is open."""
+    if not db_pool:
+        return await asyncio.to_thread(get_pgvector_status)
+    try:
+        async with db_pool.connection() as conn:
+            cur = await conn.execute(PGVECTOR_STATUS_SQL)
+            result = await cur.fetchone()
+        return (result["extversion"], result["halfvec_index"]) if result else (None, False)
+    except Exception as e:
+        logger.warning(f"Error checking pgvector availability: {e}")
+        return None, False
+
+
+async def get_pgvector_version_async() -> Optional[str]:
+    """Return the installed pgvector version using a pooled connection when one is open."""
+    version, _ = await get_pgvector_status_async()
+    return version
+
+
+async def is_pgvector_available() -> bool:
+    """Check if pgvector extension is available and installed."""
+    return await get_pgvector_version_async() is not None
+
+
+def supports_halfvec(pgvector_version: Optional[str]) -> bool:
+    """halfvec (half-precision vectors) was added in pgvector 0.7.0."""
+    if not pgvector_version:
+        return False
+    try:
+        major, minor = (int(part) for part in pgvector_version.split(".")[:2])
+    except ValueError:
+        return False
+    return (major, minor) >= (0, 7)
 
 
-# Global flag for vector operations
-VECTOR_ENABLED = is_pgvector_available()
-print(f"Vector operations enabled: {VECTOR_ENABLED}")
+# Global flags for vector operations, set once per worker during lifespan
+# startup (after the pool opens) rather than by a blocking query at import
+PGVECTOR_VERSION: Optional[str] = None
+VECTOR_ENABLED = False
+HALFVEC_ENABLED = False
 
 
 # Request/Response Models
+# Request models are frozen: handlers (and the response caches keyed on them)
+# can rely on a request not changing once it has been validated.
 # SECURITY: Max content sizes to prevent DoS and excessive token consumption
 MAX_SCRIPT_SIZE = 1_000_000  # 1MB max for scripts
 MAX_EMBEDDING_SIZE = 100_000  # 100KB max for embedding requests (token limit)
 
 class ScriptContent(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     content: str = Field(
         ...,
         max_length=MAX_SCRIPT_SIZE,
@@ -412,9 +786,12 @@ class ScriptContent(BaseModel):
     )
     script_id: Optional[int] = Field(None, description="Script ID if already stored")
     script_name: Optional[str] = Field(None, description="Name of the script")
+    no_cache: bool = Field(False, description="Bypass the analysis response cache")
 
 
 class ScriptEmbeddingRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     content: str = Field(
         ...,
         max_length=MAX_EMBEDDING_SIZE,
@@ -422,12 +799,35 @@ class ScriptEmbeddingRequest(BaseModel):
     )
 
 
+MAX_EMBEDDING_BATCH = 2048  # Max inputs per /embedding/batch request
+
+
+class BatchEmbeddingRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    contents: List[Annotated[str, Field(max_length=MAX_EMBEDDING_SIZE)]] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_EMBEDDING_BATCH,
+        description="PowerShell script contents to embed (max 2048 items, 100KB each)"
+    )
+
+
+# Upper bound on /similar results; HNSW scans are sized to return this many
+MAX_SIMILAR_LIMIT = 100
+# pgvector's default hnsw.ef_search; an HNSW scan yields at most this many rows
+HNSW_DEFAULT_EF_SEARCH = 40
+
+
 class SimilarScriptsRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     script_id: Optional[int] = Field(None, 
                                     description="Script ID to find similar scripts for")
     content: Optional[str] = Field(None, 
                                   description="Script content to find similar scripts for")
-    limit: int = Field(5, description="Maximum number of similar scripts to return")
+    limit: int = Field(5, ge=1, le=MAX_SIMILAR_LIMIT,
+                       description="Maximum number of similar scripts to return")
 
 
 class AnalysisResponse(BaseModel):
@@ -445,7 +845,22 @@ class AnalysisResponse(BaseModel):
 
 
 class EmbeddingResponse(BaseModel):
-    embedding: List[float]
+    # Legacy form: a JSON list of floats (format=json)
+    embedding: Optional[List[float]] = None
+    # Compact form: little-endian float16/float32 bytes, base64-encoded
+    # (decode with np.frombuffer(base64.b64decode(data_b64), dtype="<f2"/"<f4"))
+    dtype: Optional[Literal["f16", "f32"]] = None
+    shape: Optional[List[int]] = None
+    data_b64: Optional[str] = None
+
+
+class BatchEmbeddingResponse(BaseModel):
+    # Legacy form: one JSON list of floats per input (format=json)
+    embeddings: Optional[List[List[float]]] = None
+    # Compact form: a row-major (inputs x dimension) matrix of packed floats
+    dtype: Optional[Literal["f16", "f32"]] = None
+    shape: Optional[List[int]] = None
+    data_b64: Optional[str] = None
 
 
 class SimilarScript(BaseModel):
@@ -477,6 +892,8 @@ MAX_MESSAGE_SIZE = 50_000  # 50KB max per message
 MAX_MESSAGES = 50  # Max messages in conversation history
 
 class ChatMessage(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     role: str = Field(..., description="The role of the message sender (user or assistant)")
     content: str = Field(
         ...,
@@ -486,6 +903,8 @@ class ChatMessage(BaseModel):
 
 
 class ChatRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     messages: List[ChatMessage] = Field(
         ...,
         max_length=MAX_MESSAGES,
@@ -503,8 +922,9 @@ class ChatRequest(BaseModel):
                                      description="Session ID for persistent conversations")
     model: Optional[str] = Field(None, description="AI model to use")
     provider: Optional[Literal["openai", "anthropic"]] = Field(None, description="AI provider")
+    no_cache: bool = Field(False, description="Bypass the chat response cache")
 
-    @validator("model", pre=True, always=False)
+    @field_validator("model", mode="before")
     @classmethod
     def validate_model_name(cls, v):
         if v is None:
@@ -538,17 +958,112 @@ def _get_openai_client(api_key: str):
     return _openai_client_cache[api_key]
 
 
+# Assistant agents keyed by API key. Construction creates or looks up the
+# remote assistant, and thread_map is what lets a session_id continue a thread,
+# so one agent is kept per key (most recently used first out).
+ASSISTANT_AGENT_CACHE_SIZE = int(os.getenv("ASSISTANT_AGENT_CACHE_SIZE", "8"))
+_assistant_agents: "OrderedDict[str, Any]" = OrderedDict()
+_assistant_agents_lock = asyncio.Lock()
+
+
+async def get_assistant_agent(api_key: str):
+    """Return the shared OpenAIAssistantAgent for api_key, creating it on first use."""
+    async with _assistant_agents_lock:
+        agent = _assistant_agents.get(api_key)
+        if agent is None:
+            # The constructor makes blocking Assistants API calls
+            agent = await asyncio.to_thread(OpenAIAssistantAgent, api_key=api_key)
+            _assistant_agents[api_key] = agent
+            while len(_assistant_agents) > ASSISTANT_AGENT_CACHE_SIZE:
+                _assistant_agents.popitem(last=False)
+        else:
+            _assistant_agents.move_to_end(api_key)
+        return agent
+
+
 # API Routes
-@app.get("/", tags=["Root"])
-async def root():
-    """Root endpoint, returns API info."""
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match check using weak comparison (RFC 9110 13.1.2).
+
+    Handles "*", comma-separated lists and W/ prefixes, which proxies add
+    when they compress a response on the way to the client.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def cacheable_json(body: bytes, etag: str, cache_control: str, if_none_match: Optional[str]) -> Response:
+    """Return pre-serialized JSON with HTTP cache headers, or 304 when the client's ETag matches."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def json_body(model: Type[ModelT]) -> Callable[[Request], Awaitable[ModelT]]:
+    """
+    Dependency validating the raw request body with pydantic-core's JSON parser.
+
+    FastAPI otherwise runs json.loads into Python dicts and validates those in
+    a second pass; for flat bodies with large strings that first pass is most
+    of the cost. Errors keep FastAPI's 422 shape. Pair with json_body_openapi
+    so the schema still shows up in the docs.
+    """
+    async def parse(request: Request) -> ModelT:
+        try:
+            return model.model_validate_json(await request.body())
+        except PydanticValidationError as e:
+            raise RequestValidationError(
+                [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+            )
+    return parse
+
+
+def json_body_openapi(model: Type[BaseModel]) -> Dict[str, Any]:
+    """openapi_extra documenting a body read through json_body (flat models only)."""
     return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}}
+        }
+    }
+
+
+# Only changes with the agent coordinator state, which is fixed after startup;
+# a short max-age lets the backend proxy and browsers reuse it.
+ROOT_CACHE_CONTROL = "public, max-age=300"
+
+
+def _root_payload(coordinator_enabled: bool) -> Tuple[bytes, str]:
+    body = orjson.dumps({
         "message": "PowerShell Script Analysis API",
         "version": "0.2.0",
         "status": "operational",
         "mode": "production",
-        "agent_coordinator": "enabled" if agent_coordinator else "disabled"
-    }
+        "agent_coordinator": "enabled" if coordinator_enabled else "disabled"
+    })
+    return body, f'"{hashlib.md5(body).hexdigest()}"'
+
+
+# Both possible bodies and ETags, serialized once
+ROOT_PAYLOADS = {enabled: _root_payload(enabled) for enabled in (True, False)}
+
+
+@app.get("/", tags=["Root"])
+async def root(if_none_match: Optional[str] = Header(None)):
+    """Root endpoint, returns API info."""
+    body, etag = ROOT_PAYLOADS[agent_coordinator is not None]
+    return cacheable_json(body, etag, ROOT_CACHE_CONTROL, if_none_match)
 
 
 @app.get("/health", tags=["Health"])
@@ -563,80 +1078,264 @@ async def health_check():
     }
 
 
-@app.post("/api/agents/execute", tags=["Agents"])
+# Agents accepted by /api/agents/execute: ordered for error bodies, a set for lookups
+VALID_AGENTS = ("coordinator", "analyzer", "generator", "security")
+VALID_AGENT_SET = frozenset(VALID_AGENTS)
+
+
+@app.post("/api/agents/execute", response_model=None, tags=["Agents"])
 async def execute_agent(request: dict):
     """
     Execute an AI agent with the given task.
     Supports multiple agent types with proper error handling.
+
+    Successful results are returned as plain dicts and rendered by the default
+    ORJSONResponse; only error branches build a response for their status code.
     """
-    try:
-        # Validate required fields
-        if "agent" not in request:
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Missing required field: agent"}
-            )
+    # Validate required fields
+    if "agent" not in request:
+        return ORJSONResponse(
+            status_code=400,
+            content={"error": "Missing required field: agent"}
+        )
 
-        if "task" not in request:
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Missing required field: task"}
-            )
+    if "task" not in request:
+        return ORJSONResponse(
+            status_code=400,
+            content={"error": "Missing required field: task"}
+        )
 
-        agent_type = request.get("agent")
-        task = request.get("task")
-        request.get("timeout", 30000)  # Default 30 second timeout
-
-        # Validate agent type
-        valid_agents = ["coordinator", "analyzer", "generator", "security"]
-        if agent_type not in valid_agents:
-            return JSONResponse(
-                status_code=404,
-                content={
-                    "error": f"Agent '{agent_type}' not found",
-                    "available_agents": valid_agents
-                }
-            )
+    agent_type = request.get("agent")
+    task = request.get("task")
 
-        # Check if agent coordinator is available
-        if not agent_coordinator:
-            return JSONResponse(
-                status_code=503,
-                content={"error": "Agent coordinator is not available"}
-            )
+    # Validate agent type
+    if agent_type not in VALID_AGENT_SET:
+        return ORJSONResponse(
+            status_code=404,
+            content={
+                "error": f"Agent '{agent_type}' not found",
+                "available_agents": VALID_AGENTS
+            }
+        )
+
+    # Check if agent coordinator is available
+    if not agent_coordinator:
+        return ORJSONResponse(
+            status_code=503,
+            content={"error": "Agent coordinator is not available"}
+        )
+
+    # Execute the agent task
+    return {
+        "agent": agent_type,
+        "task": task,
+        "status": "completed",
+        "result": f"Task '{task}' executed successfully by {agent_type} agent"
+    }
+
+
+# In-process layer in front of the Redis caches for the script endpoints: a
+# TTL'd LRU (so repeats are free even without REDIS_URL, and hits skip the
+# Redis round trip) plus per-key singleflight, so concurrent submissions of
+# the same script share one analysis run.
+SCRIPT_RESULT_TTL = int(os.getenv("SCRIPT_RESULT_TTL", "3600"))  # seconds
+SCRIPT_RESULT_MAX_ENTRIES = int(os.getenv("SCRIPT_RESULT_MAX_ENTRIES", "1024"))
+_script_results: "OrderedDict[Tuple[str, bytes], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_script_inflight: Dict[Tuple[str, bytes], asyncio.Future] = {}
 
-        # Execute the agent task
-        result = {
-            "agent": agent_type,
-            "task": task,
-            "status": "completed",
-            "result": f"Task '{task}' executed successfully by {agent_type} agent"
-        }
 
-        return JSONResponse(status_code=200, content=result)
+def script_result_key(content: str, scope: str) -> Tuple[str, bytes]:
+    """Cache key: endpoint/flag scope plus a 128-bit digest of the script."""
+    return scope, hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
 
-    except TimeoutError:
-        return JSONResponse(
-            status_code=408,
-            content={"error": "Request timeout - task took too long to complete"}
+
+async def memoized_script_result(
+    key: Tuple[str, bytes],
+    load: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """Return the in-process result for key, running load at most once per key at a time."""
+    entry = _script_results.get(key)
+    if entry is not None:
+        if entry[0] > time.monotonic():
+            _script_results.move_to_end(key)
+            return entry[1]
+        del _script_results[key]
+
+    while (inflight := _script_inflight.get(key)) is not None:
+        try:
+            # shield: a follower disconnecting must not cancel the leader's run
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise  # this request itself was cancelled
+            # The leader went away mid-run; take over or join whoever did
+
+    future = asyncio.get_running_loop().create_future()
+    _script_inflight[key] = future
+    try:
+        result = await load()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved when no follower is waiting
+        raise
+    finally:
+        _script_inflight.pop(key, None)
+
+    future.set_result(result)
+    # The coordinator reports failures as {"error": ...}; never keep those
+    if "error" not in result:
+        _script_results[key] = (time.monotonic() + SCRIPT_RESULT_TTL, result)
+        while len(_script_results) > SCRIPT_RESULT_MAX_ENTRIES:
+            _script_results.popitem(last=False)
+    return result
+
+
+# Per-worker cap on concurrently running analyses (LLM/agent calls, pwsh
+# linting). Past the cap a request waits briefly for a slot, then gets 429,
+# so bursts back off instead of piling onto memory and the OpenAI rate limit.
+# Cache hits never take a slot.
+MAX_CONCURRENT_ANALYSES = int(os.getenv("MAX_CONCURRENT_ANALYSES", "8"))
+ANALYSIS_SLOT_TIMEOUT = float(os.getenv("ANALYSIS_SLOT_TIMEOUT", "0.5"))  # seconds
+_analysis_slots = asyncio.Semaphore(MAX_CONCURRENT_ANALYSES)
+
+
+@asynccontextmanager
+async def analysis_slot():
+    """Hold one of this worker's analysis slots; raise 429 if none frees up in time."""
+    try:
+        await asyncio.wait_for(_analysis_slots.acquire(), timeout=ANALYSIS_SLOT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many analyses in progress; retry shortly",
+            headers={"Retry-After": "1"}
         )
-    except ValueError as e:
-        return JSONResponse(
-            status_code=422,
-            content={"error": f"Validation error: {str(e)}"}
+    try:
+        yield
+    finally:
+        _analysis_slots.release()
+
+
+async def run_script_analysis(
+    script_data: ScriptContent,
+    include_command_details: bool,
+    fetch_ms_docs: bool,
+    api_key: Optional[str]
+) -> Dict[str, Any]:
+    """Run a full script analysis through the agent coordinator or the legacy hybrid agent."""
+    # Use the agent coordinator if available
+    if agent_coordinator:
+        # Prepare metadata
+        metadata = {
+            "include_command_details": include_command_details,
+            "fetch_ms_docs": fetch_ms_docs
+        }
+
+        # Perform script analysis with the agent coordinator
+        analysis_results = await agent_coordinator.analyze_script(
+            script_content=script_data.content,
+            script_name=script_data.script_name,
+            script_id=script_data.script_id,
+            metadata=metadata
         )
-    except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={"error": f"Internal server error: {str(e)}"}
+
+        # Extract the analysis results (agent_coordinator returns flat structure)
+        # Normalize types to match the response model
+        security_analysis = analysis_results.get("security_analysis", "No security analysis available")
+        if isinstance(security_analysis, list):
+            security_analysis = "\n".join(str(item) for item in security_analysis)
+
+        parameters = analysis_results.get("parameters", {})
+        if isinstance(parameters, str):
+            parameters = {"description": parameters}
+        elif isinstance(parameters, list):
+            parameters = {"items": parameters} if parameters else {}
+
+        optimization = analysis_results.get("optimization", [])
+        if isinstance(optimization, str):
+            optimization = [optimization] if optimization else []
+
+        analysis = {
+            "purpose": str(analysis_results.get("purpose", "Unknown purpose")),
+            "security_analysis": security_analysis,
+            "security_score": float(analysis_results.get("security_score", 5.0)),
+            "code_quality_score": float(analysis_results.get("code_quality_score", 5.0)),
+            "parameters": parameters,
+            "category": str(analysis_results.get("category", "Utilities & Helpers")),
+            "category_id": analysis_results.get("category_id"),  # May already be set
+            "optimization": optimization,
+            "risk_score": float(analysis_results.get("risk_score", 5.0))
+        }
+
+        # Add command details if requested
+        if include_command_details:
+            analysis["command_details"] = analysis_results.get("command_details", [])
+
+        # Add MS Docs references if requested
+        if fetch_ms_docs:
+            analysis["ms_docs_references"] = analysis_results.get(
+                "ms_docs_references", [])
+
+        # Map category to category_id if not already set
+        if analysis["category_id"] is None:
+            analysis["category_id"] = CATEGORY_IDS.get(analysis["category"], DEFAULT_CATEGORY_ID)
+    else:
+        # Fall back to the legacy agent system
+        agent = agent_factory.get_agent("hybrid", api_key or config.api_keys.openai)
+
+        # Perform script analysis with the hybrid agent
+        analysis = await agent.analyze_script(
+            script_data.script_id or "temp", 
+            script_data.content,
+            include_command_details=include_command_details,
+            fetch_ms_docs=fetch_ms_docs
         )
 
+    return analysis
+
+
+# Per-item list fields that the NDJSON form of /analyze emits one line each
+ANALYSIS_STREAM_ITEMS = (
+    ("command_details", "command_detail"),
+    ("ms_docs_references", "ms_docs_reference"),
+)
+ANALYSIS_STREAM_HEADER_EXCLUDE = frozenset(field for field, _ in ANALYSIS_STREAM_ITEMS)
+
+
+def analysis_ndjson(analysis: Dict[str, Any]) -> AsyncIterator[bytes]:
+    """
+    Encode an analysis as NDJSON: a {"header": ...} line, then one line per item.
+
+    The header carries the AnalysisResponse fields except the per-command
+    lists, so clients can render scores and the summary while the (often
+    much larger) command details and docs references are still arriving.
+    It is validated before the generator is returned, so a malformed
+    analysis fails the request instead of breaking an already-started stream.
+    """
+    header = AnalysisResponse.model_validate(analysis).model_dump(
+        exclude=ANALYSIS_STREAM_HEADER_EXCLUDE
+    )
+    header_line = orjson.dumps({"header": header}, option=ORJSON_OPTIONS) + b"\n"
+
+    async def lines() -> AsyncIterator[bytes]:
+        yield header_line
+        for field, key in ANALYSIS_STREAM_ITEMS:
+            for item in analysis.get(field) or ():
+                yield orjson.dumps({key: item}, option=ORJSON_OPTIONS) + b"\n"
+
+    return lines()
+
 
 @app.post("/analyze", response_model=AnalysisResponse, tags=["Analysis"])
 async def analyze_script(
     script_data: ScriptContent,
+    background_tasks: BackgroundTasks,
     include_command_details: bool = False,
     fetch_ms_docs: bool = False,
+    stream: bool = False,
     api_key: Optional[str] = Header(None, alias="x-api-key")
 ):
     """
@@ -644,210 +1343,220 @@ async def analyze_script(
     
     - include_command_details: Set to true to include detailed analysis of each PowerShell command
     - fetch_ms_docs: Set to true to fetch Microsoft documentation references
+    - stream: Set to true to receive application/x-ndjson: a "header" line with the
+      analysis, then one "command_detail" / "ms_docs_reference" line per item
     - api_key: Optional OpenAI API key to use for this request
     """
     try:
-        # Use the agent coordinator if available
-        if agent_coordinator:
-            # Prepare metadata
-            metadata = {
-                "include_command_details": include_command_details,
-                "fetch_ms_docs": fetch_ms_docs
-            }
-            
-            # Perform script analysis with the agent coordinator
-            analysis_results = await agent_coordinator.analyze_script(
-                script_content=script_data.content,
-                script_name=script_data.script_name,
-                script_id=script_data.script_id,
-                metadata=metadata
+        # Serve repeated scripts from the analysis cache. Lookups are exact
+        # (content digest): a script one destructive line away from a cached
+        # one embeds almost identically but must not inherit its scores
+        cache_scope = f"commands={include_command_details};docs={fetch_ms_docs}"
+
+        async def load_analysis() -> Dict[str, Any]:
+            cached = await analysis_cache.get(script_data.content, scope=cache_scope)
+            if cached is not None:
+                return cached
+
+            async with analysis_slot():
+                result = await run_script_analysis(
+                    script_data, include_command_details, fetch_ms_docs, api_key
+                )
+            # The Redis write happens after the response is sent
+            background_tasks.add_task(
+                analysis_cache.set, script_data.content, result, scope=cache_scope
             )
-            
-            # Extract the analysis results (agent_coordinator returns flat structure)
-            # Normalize types to match the response model
-            security_analysis = analysis_results.get("security_analysis", "No security analysis available")
-            if isinstance(security_analysis, list):
-                security_analysis = "\n".join(str(item) for item in security_analysis)
-
-            parameters = analysis_results.get("parameters", {})
-            if isinstance(parameters, str):
-                parameters = {"description": parameters}
-            elif isinstance(parameters, list):
-                parameters = {"items": parameters} if parameters else {}
-
-            optimization = analysis_results.get("optimization", [])
-            if isinstance(optimization, str):
-                optimization = [optimization] if optimization else []
-
-            analysis = {
-                "purpose": str(analysis_results.get("purpose", "Unknown purpose")),
-                "security_analysis": security_analysis,
-                "security_score": float(analysis_results.get("security_score", 5.0)),
-                "code_quality_score": float(analysis_results.get("code_quality_score", 5.0)),
-                "parameters": parameters,
-                "category": str(analysis_results.get("category", "Utilities & Helpers")),
-                "category_id": analysis_results.get("category_id"),  # May already be set
-                "optimization": optimization,
-                "risk_score": float(analysis_results.get("risk_score", 5.0))
-            }
+            return result
 
-            # Add command details if requested
-            if include_command_details:
-                analysis["command_details"] = analysis_results.get("command_details", [])
-
-            # Add MS Docs references if requested
-            if fetch_ms_docs:
-                analysis["ms_docs_references"] = analysis_results.get(
-                    "ms_docs_references", [])
-            
-            # Map category to category_id if not already set
-            if analysis["category_id"] is None:
-                category_mapping = {
-                    "System Administration": 1,
-                    "Security & Compliance": 2,
-                    "Automation & DevOps": 3,
-                    "Cloud Management": 4,
-                    "Network Management": 5,
-                    "Data Management": 6,
-                    "Active Directory": 7,
-                    "Monitoring & Diagnostics": 8,
-                    "Backup & Recovery": 9,
-                    "Utilities & Helpers": 10
-                }
-                analysis["category_id"] = category_mapping.get(analysis["category"], 10)
+        if script_data.no_cache:
+            async with analysis_slot():
+                analysis = await run_script_analysis(
+                    script_data, include_command_details, fetch_ms_docs, api_key
+                )
         else:
-            # Fall back to the legacy agent system
-            agent = agent_factory.get_agent("hybrid", api_key or config.api_keys.openai)
-            
-            # Perform script analysis with the hybrid agent
-            analysis = await agent.analyze_script(
-                script_data.script_id or "temp", 
-                script_data.content,
-                include_command_details=include_command_details,
-                fetch_ms_docs=fetch_ms_docs
+            analysis = await memoized_script_result(
+                script_result_key(script_data.content, f"analyze;{cache_scope}"),
+                load_analysis
             )
         
-        # If a valid script_id is provided, store the analysis result in the database.
+        # If a valid script_id is provided, persist the analysis after the response is sent.
         # script_id must reference an existing scripts.id row; otherwise the FK constraint will fail.
         if script_data.script_id:
             try:
-                conn = None
-                # Ensure script_id is an integer ID
-                try:
-                    script_id_int = int(script_data.script_id)
-                except Exception:
-                    # Non-integer IDs (e.g., "temp") should never be persisted to script_analysis.
-                    return analysis
-
-                conn = get_db_connection()
-                cur = conn.cursor()
-
-                # Ensure the script exists before inserting/updating analysis (avoids FK violations).
-                cur.execute("SELECT 1 FROM scripts WHERE id = %s", (script_id_int,))
-                if cur.fetchone() is None:
-                    return analysis
-                
-                # Check if analysis exists for this script
-                cur.execute(
-                    "SELECT id FROM script_analysis WHERE script_id = %s",
-                    (script_id_int,)
-                )
-                existing = cur.fetchone()
-                
-                if existing:
-                    # Update existing analysis
-                    cur.execute(
-                        """
-                        UPDATE script_analysis
-                        SET purpose = %s, security_score = %s, quality_score = %s, 
-                            risk_score = %s, parameter_docs = %s, suggestions = %s,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE script_id = %s
-                        RETURNING id
-                        """,
-                        (
-                            analysis["purpose"],
-                            analysis["security_score"],
-                            analysis["code_quality_score"],
-                            analysis["risk_score"],
-                            json.dumps(analysis["parameters"]),
-                            json.dumps(analysis["optimization"]),
-                            script_id_int
-                        )
-                    )
-                else:
-                    # Insert new analysis
-                    cur.execute(
-                        """
-                        INSERT INTO script_analysis
-                        (script_id, purpose, security_score, quality_score, risk_score, 
-                         parameter_docs, suggestions)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        RETURNING id
-                        """,
-                        (
-                            script_id_int,
-                            analysis["purpose"],
-                            analysis["security_score"],
-                            analysis["code_quality_score"],
-                            analysis["risk_score"],
-                            json.dumps(analysis["parameters"]),
-                            json.dumps(analysis["optimization"])
-                        )
-                    )
-                
-                conn.commit()
-            
-            except Exception as e:
-                print(f"Database error: {e}")
-                # Continue even if database operation fails
-            finally:
-                if conn:
-                    conn.close()
+                script_id_int = int(script_data.script_id)
+            except (TypeError, ValueError):
+                # Non-integer IDs (e.g., "temp") should never be persisted to script_analysis.
+                script_id_int = None
+
+            if script_id_int is not None:
+                background_tasks.add_task(_persist_analysis, script_id_int, analysis)
         
+        if stream:
+            # FastAPI attaches background_tasks to the returned response
+            return StreamingResponse(analysis_ndjson(analysis), media_type="application/x-ndjson")
         return analysis
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
-@app.post("/security-analysis", tags=["Analysis"])
-async def analyze_script_security(
+async def cached_script_result(
     script_data: ScriptContent,
-    api_key: Optional[str] = Header(None, alias="x-api-key")
-):
+    endpoint: str,
+    background_tasks: BackgroundTasks,
+    compute: Callable[[], Awaitable[Dict[str, Any]]]
+) -> ORJSONResponse:
     """
-    Analyze the security aspects of a PowerShell script.
-    
-    - api_key: Optional OpenAI API key to use for this request
+    Serve repeat submissions of the same script from the script cache.
+
+    Lookups are exact (content digest); scores and findings are not reused for
+    merely similar scripts. The in-process layer answers first; Redis misses
+    are computed and stored after the response is sent. The scope separates
+    endpoints and the coordinator and legacy code paths, whose result shapes
+    differ.
+
+    Results are wrapped in ORJSONResponse because these routes have no
+    response_model: a returned dict would first be copied by jsonable_encoder.
+    FastAPI still attaches background_tasks to a returned Response.
     """
-    try:
-        # Use the agent coordinator if available
-        if agent_coordinator:
-            security_results = await agent_coordinator.analyze_script_security(
-                script_content=script_data.content,
-                script_name=script_data.script_name,
-                script_id=script_data.script_id
-            )
-            return security_results
-        else:
-            # Fall back to the legacy agent system
-            agent = agent_factory.get_agent("hybrid", api_key or config.api_keys.openai)
-            
-            # Extract security analysis from the full analysis
-            full_analysis = await agent.analyze_script(
-                script_data.script_id or "temp", 
-                script_data.content,
-                include_command_details=False,
-                fetch_ms_docs=False
-            )
-            
-            return {
-                "security_score": full_analysis["security_score"],
-                "security_analysis": full_analysis["security_analysis"],
-                "risk_score": full_analysis["risk_score"]
-            }
+    if script_data.no_cache:
+        async with analysis_slot():
+            return ORJSONResponse(await compute())
+
+    scope = f"{endpoint};coordinator={agent_coordinator is not None}"
+
+    async def load() -> Dict[str, Any]:
+        cached = await script_cache.get(script_data.content, scope=scope)
+        if cached is not None:
+            return cached
+
+        async with analysis_slot():
+            result = await compute()
+        # The coordinator reports failures as {"error": ...}; never cache those
+        if "error" not in result:
+            background_tasks.add_task(script_cache.set, script_data.content, result, scope=scope)
+        return result
+
+    return ORJSONResponse(
+        await memoized_script_result(script_result_key(script_data.content, scope), load)
+    )
+
+
+async def run_security_analysis(
+    script_data: ScriptContent,
+    api_key: Optional[str]
+) -> Dict[str, Any]:
+    """Run the security analysis for a script (uncached)."""
+    # Use the agent coordinator if available
+    if agent_coordinator:
+        security_results = await agent_coordinator.analyze_script_security(
+            script_content=script_data.content,
+            script_name=script_data.script_name,
+            script_id=script_data.script_id
+        )
+        return security_results
+    else:
+        # Fall back to the legacy agent system
+        agent = agent_factory.get_agent("hybrid", api_key or config.api_keys.openai)
+        
+        # Extract security analysis from the full analysis
+        full_analysis = await agent.analyze_script(
+            script_data.script_id or "temp", 
+            script_data.content,
+            include_command_details=False,
+            fetch_ms_docs=False
+        )
+        
+        return {
+            "security_score": full_analysis["security_score"],
+            "security_analysis": full_analysis["security_analysis"],
+            "risk_score": full_analysis["risk_score"]
+        }
+
+
+async def run_categorization(
+    script_data: ScriptContent,
+    api_key: Optional[str]
+) -> Dict[str, Any]:
+    """Categorize a script (uncached)."""
+    # Use the agent coordinator if available
+    if agent_coordinator:
+        categorization_results = await agent_coordinator.categorize_script(
+            script_content=script_data.content,
+            script_name=script_data.script_name,
+            script_id=script_data.script_id
+        )
+        return categorization_results
+    else:
+        # Fall back to the legacy agent system
+        agent = agent_factory.get_agent("hybrid", api_key or config.api_keys.openai)
+        
+        # Extract categorization from the full analysis
+        full_analysis = await agent.analyze_script(
+            script_data.script_id or "temp", 
+            script_data.content,
+            include_command_details=False,
+            fetch_ms_docs=False
+        )
+        
+        return {
+            "category": full_analysis["category"],
+            "category_id": full_analysis["category_id"],
+            "confidence": 0.8  # Default confidence for legacy system
+        }
+
+
+async def run_documentation_search(
+    script_data: ScriptContent,
+    api_key: Optional[str]
+) -> Dict[str, Any]:
+    """Find documentation references for a script (uncached)."""
+    # Use the agent coordinator if available
+    if agent_coordinator:
+        documentation_results = await agent_coordinator.find_documentation_references(
+            script_content=script_data.content,
+            script_name=script_data.script_name,
+            script_id=script_data.script_id
+        )
+        return documentation_results
+    else:
+        # Fall back to the legacy agent system
+        agent = agent_factory.get_agent("hybrid", api_key or config.api_keys.openai)
+        
+        # Perform script analysis with documentation
+        full_analysis = await agent.analyze_script(
+            script_data.script_id or "temp", 
+            script_data.content,
+            include_command_details=False,
+            fetch_ms_docs=True
+        )
+        
+        return {
+            "references": full_analysis.get("ms_docs_references", []),
+            "commands_found": len(full_analysis.get("ms_docs_references", []))
+        }
+
+
+@app.post("/security-analysis", tags=["Analysis"])
+async def analyze_script_security(
+    script_data: ScriptContent,
+    background_tasks: BackgroundTasks,
+    api_key: Optional[str] = Header(None, alias="x-api-key")
+):
+    """
+    Analyze the security aspects of a PowerShell script.
     
+    - api_key: Optional OpenAI API key to use for this request
+    """
+    try:
+        return await cached_script_result(
+            script_data, "security", background_tasks,
+            lambda: run_security_analysis(script_data, api_key)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, 
                            detail=f"Security analysis failed: {str(e)}")
@@ -856,6 +1565,7 @@ async def analyze_script_security(
 @app.post("/categorize", tags=["Analysis"])
 async def categorize_script(
     script_data: ScriptContent,
+    background_tasks: BackgroundTasks,
     api_key: Optional[str] = Header(None, alias="x-api-key")
 ):
     """
@@ -864,32 +1574,12 @@ async def categorize_script(
     - api_key: Optional OpenAI API key to use for this request
     """
     try:
-        # Use the agent coordinator if available
-        if agent_coordinator:
-            categorization_results = await agent_coordinator.categorize_script(
-                script_content=script_data.content,
-                script_name=script_data.script_name,
-                script_id=script_data.script_id
-            )
-            return categorization_results
-        else:
-            # Fall back to the legacy agent system
-            agent = agent_factory.get_agent("hybrid", api_key or config.api_keys.openai)
-            
-            # Extract categorization from the full analysis
-            full_analysis = await agent.analyze_script(
-                script_data.script_id or "temp", 
-                script_data.content,
-                include_command_details=False,
-                fetch_ms_docs=False
-            )
-            
-            return {
-                "category": full_analysis["category"],
-                "category_id": full_analysis["category_id"],
-                "confidence": 0.8  # Default confidence for legacy system
-            }
-    
+        return await cached_script_result(
+            script_data, "categorize", background_tasks,
+            lambda: run_categorization(script_data, api_key)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Categorization failed: {str(e)}")
 
@@ -897,6 +1587,7 @@ async def categorize_script(
 @app.post("/documentation", tags=["Analysis"])
 async def find_documentation_references(
     script_data: ScriptContent,
+    background_tasks: BackgroundTasks,
     api_key: Optional[str] = Header(None, alias="x-api-key")
 ):
     """
@@ -905,31 +1596,12 @@ async def find_documentation_references(
     - api_key: Optional OpenAI API key to use for this request
     """
     try:
-        # Use the agent coordinator if available
-        if agent_coordinator:
-            documentation_results = await agent_coordinator.find_documentation_references(
-                script_content=script_data.content,
-                script_name=script_data.script_name,
-                script_id=script_data.script_id
-            )
-            return documentation_results
-        else:
-            # Fall back to the legacy agent system
-            agent = agent_factory.get_agent("hybrid", api_key or config.api_keys.openai)
-            
-            # Perform script analysis with documentation
-            full_analysis = await agent.analyze_script(
-                script_data.script_id or "temp", 
-                script_data.content,
-                include_command_details=False,
-                fetch_ms_docs=True
-            )
-            
-            return {
-                "references": full_analysis.get("ms_docs_references", []),
-                "commands_found": len(full_analysis.get("ms_docs_references", []))
-            }
-    
+        return await cached_script_result(
+            script_data, "documentation", background_tasks,
+            lambda: run_documentation_search(script_data, api_key)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500,
                            detail=f"Documentation search failed: {str(e)}")
@@ -974,8 +1646,8 @@ async def lint_powershell_script(request: PSScriptAnalyzerRequest):
             check_availability
         )
 
-        # Check if PSScriptAnalyzer is available
-        available, status = check_availability()
+        # PSScriptAnalyzer shells out to pwsh; keep the subprocess off the event loop
+        available, status = await asyncio.to_thread(check_availability)
 
         if not available:
             return PSScriptAnalyzerResponse(
@@ -988,9 +1660,10 @@ async def lint_powershell_script(request: PSScriptAnalyzerRequest):
                 info=0
             )
 
-        # Run analysis
+        # Run analysis (each run is a pwsh subprocess, so it counts against the cap)
         analyzer = PSScriptAnalyzer()
-        results = analyzer.analyze_script(request.content)
+        async with analysis_slot():
+            results = await asyncio.to_thread(analyzer.analyze_script, request.content)
 
         # Count by severity
         errors = len([r for r in results if r.severity == Severity.ERROR])
@@ -1010,6 +1683,8 @@ async def lint_powershell_script(request: PSScriptAnalyzerRequest):
             info=info
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"PSScriptAnalyzer error: {str(e)}")
         return PSScriptAnalyzerResponse(
@@ -1031,7 +1706,7 @@ async def get_psscriptanalyzer_status():
     try:
         from utils.psscriptanalyzer import check_availability
 
-        available, status = check_availability()
+        available, status = await asyncio.to_thread(check_availability)
         return {
             "available": available,
             "status": status,
@@ -1664,7 +2339,7 @@ Original script:
 
 Improved script:"""
 
-        client = get_openai_client()
+        client = _get_openai_client(config.api_keys.openai)
         response = await client.chat.completions.create(
             model=config.agent.default_model,
             messages=[{"role": "user", "content": improvement_prompt}],
@@ -1713,24 +2388,287 @@ Improved script:"""
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/embedding", response_model=EmbeddingResponse, tags=["Embeddings"])
-async def create_embedding(request: ScriptEmbeddingRequest):
+EMBEDDING_DTYPES = {"f16": "<f2", "f32": "<f4"}
+
+
+# /embedding and /similar return plain dicts straight to ORJSONResponse; the
+# models only document the schema, so the float lists are not re-validated.
+@app.post(
+    "/embedding",
+    response_model=None,
+    responses={200: {"model": EmbeddingResponse}},
+    tags=["Embeddings"]
+)
+async def create_embedding(
+    request: ScriptEmbeddingRequest,
+    format: Literal["json", "f16", "f32"] = Query(
+        "json",
+        description="json returns a float list; f16/f32 return base64-encoded packed floats"
+    )
+):
     """Generate an embedding vector for a PowerShell script."""
     try:
-        # Use the agent coordinator if available
-        if agent_coordinator:
-            embedding = await agent_coordinator.generate_script_embedding(request.content)
-        else:
-            # Fall back to the script analyzer
-            embedding = script_analyzer.generate_embedding(request.content)
-            
-        return {"embedding": embedding}
+        # Concurrent requests share batched embeddings calls
+        embedding = await script_analyzer.generate_embedding_async(request.content)
+        
+        if format == "json":
+            return {"embedding": embedding}
+        
+        # ~3-6x smaller than the float list and no per-element JSON encoding
+        packed = np.asarray(embedding, dtype=EMBEDDING_DTYPES[format])
+        return {
+            "dtype": format,
+            "shape": list(packed.shape),
+            "data_b64": base64.b64encode(packed.tobytes()).decode("ascii")
+        }
     except Exception as e:
         raise HTTPException(status_code=500, 
                            detail=f"Embedding generation failed: {str(e)}")
 
 
-@app.post("/similar", response_model=SimilarScriptsResponse, tags=["Search"])
+@app.post(
+    "/embedding/batch",
+    response_model=None,
+    responses={200: {"model": BatchEmbeddingResponse}},
+    tags=["Embeddings"]
+)
+async def create_embeddings_batch(
+    request: BatchEmbeddingRequest,
+    format: Literal["json", "f16", "f32"] = Query(
+        "json",
+        description="json returns float lists; f16/f32 return one base64-encoded packed matrix"
+    )
+):
+    """Generate embedding vectors for many PowerShell scripts in as few API calls as possible."""
+    try:
+        embeddings = await script_analyzer.generate_embeddings_async(list(request.contents))
+        
+        if format == "json":
+            return {"embeddings": embeddings}
+        
+        packed = np.asarray(embeddings, dtype=EMBEDDING_DTYPES[format])
+        return {
+            "dtype": format,
+            "shape": list(packed.shape),
+            "data_b64": base64.b64encode(packed.tobytes()).decode("ascii")
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, 
+                           detail=f"Batch embedding generation failed: {str(e)}")
+
+
+_SIMILAR_SQL_TEMPLATE = """
+    SELECT se.script_id, s.title,
+           1 - (se.embedding <=> {query}) AS similarity
+    FROM script_embeddings se
+    JOIN scripts s ON se.script_id = s.id
+    WHERE se.script_id != %(exclude_id)s
+    ORDER BY {distance}
+    LIMIT %(limit)s
+"""
+
+
+def _similar_sql(query: str) -> Dict[bool, str]:
+    """Build the k-NN statement for a query vector expression, keyed by halfvec ranking."""
+    return {
+        False: _SIMILAR_SQL_TEMPLATE.format(query=query, distance=f"se.embedding <=> {query}"),
+        True: _SIMILAR_SQL_TEMPLATE.format(
+            query=query,
+            distance=f"se.embedding::halfvec(1536) <=> {query}::halfvec(1536)"
+        )
+    }
+
+
+# Query vector sent by the client (content searches)
+SIMILAR_SQL = _similar_sql("%(query)s")
+# Query vector looked up in the same statement (script_id searches); a scalar
+# subquery is evaluated once up front, so the HNSW index still serves the ORDER BY
+SIMILAR_BY_ID_SQL = _similar_sql(
+    "(SELECT embedding FROM script_embeddings WHERE script_id = %(script_id)s)"
+)
+
+
+# Rows pulled per round trip when streaming embeddings for the numpy fallback
+SIMILAR_FETCH_SIZE = int(os.getenv("SIMILAR_FETCH_SIZE", "2000"))
+
+
+def _embedding_vector(value: Any) -> np.ndarray:
+    """
+    Coerce a stored embedding to float32.
+
+    With the pgvector adapter registered it is already an array; without it,
+    text results arrive as '[x,y,...]' and binary ones (binary COPY) as
+    pgvector's wire format: uint16 dimensions, uint16 unused, big-endian
+    float32 values.
+    """
+    if isinstance(value, str):
+        return np.array(value.strip("[]").split(","), dtype=np.float32)
+    if isinstance(value, (bytes, memoryview)):
+        return np.frombuffer(value, dtype=">f4", offset=4)
+    return np.asarray(value, dtype=np.float32)
+
+
+# Candidate rows for the numpy fallback; columns are cast to fixed types so
+# the binary COPY stream can be decoded regardless of the deployed schema
+SIMILAR_CANDIDATES_SQL = """
+    SELECT se.script_id::int8, se.embedding, s.title::text
+    FROM script_embeddings se
+    JOIN scripts s ON se.script_id = s.id
+    WHERE se.embedding IS NOT NULL
+"""
+
+
+async def _embedding_rows(conn) -> AsyncIterator[Tuple[int, Any, str]]:
+    """
+    Yield (script_id, embedding, title) for every script with an embedding.
+
+    vector columns are streamed with COPY ... (FORMAT BINARY): one framed
+    stream with no per-row protocol messages, embeddings as raw float32
+    bytes (read through the bytea loader and decoded by _embedding_vector).
+    Other column types go through a named server-side cursor in
+    SIMILAR_FETCH_SIZE batches.
+    """
+    if VECTOR_ENABLED:
+        cur = conn.cursor()
+        async with cur.copy(f"COPY ({SIMILAR_CANDIDATES_SQL}) TO STDOUT (FORMAT BINARY)") as copy:
+            copy.set_types(["int8", "bytea", "text"])
+            async for row in copy.rows():
+                yield row
+        return
+    
+    async with conn.cursor(name="similar_embeddings", row_factory=tuple_row) as cur:
+        cur.itersize = SIMILAR_FETCH_SIZE
+        await cur.execute(SIMILAR_CANDIDATES_SQL)
+        async for row in cur:
+            yield row
+
+
+async def _load_embedding_matrix() -> Tuple[np.ndarray, List[int], List[str]]:
+    """
+    Stream every stored embedding into an (N, D) float32 matrix.
+
+    Rows are consumed as they arrive (see _embedding_rows), so the corpus is
+    never held twice (once as rows, once as the matrix). The matrix is sized
+    from a row count once the first row gives the dimension, and grown
+    geometrically only if rows are inserted between the count and the scan.
+
+    Returns:
+        The embedding matrix plus parallel script id and title lists
+    """
+    matrix = np.empty((0, 0), dtype=np.float32)
+    script_ids: List[int] = []
+    titles: List[str] = []
+    
+    async with db_pool.connection() as conn:
+        cur = await conn.execute(
+            "SELECT count(*) AS n FROM script_embeddings WHERE embedding IS NOT NULL"
+        )
+        capacity = (await cur.fetchone())["n"]
+        
+        async for script_id, embedding, title in _embedding_rows(conn):
+            vector = _embedding_vector(embedding)
+            n = len(script_ids)
+            if n == 0:
+                matrix = np.empty((max(capacity, 1), vector.shape[0]), dtype=np.float32)
+            elif n == matrix.shape[0]:
+                matrix = np.resize(matrix, (max(2 * n, SIMILAR_FETCH_SIZE), matrix.shape[1]))
+            matrix[n] = vector
+            script_ids.append(script_id)
+            titles.append(title)
+    
+    return matrix[:len(script_ids)], script_ids, titles
+
+
+# How long a worker reuses its in-memory /similar corpus before reloading it
+# (0 reloads on every request). Each worker process holds its own copy.
+SIMILAR_CORPUS_TTL = float(os.getenv("SIMILAR_CORPUS_TTL", "60"))
+# Store the corpus as int8 with a per-row scale: a quarter of the float32
+# memory, at the cost of similarity scores accurate to roughly 1e-2
+SIMILAR_CORPUS_INT8 = os.getenv("SIMILAR_CORPUS_INT8", "false").lower() == "true"
+# Rows widened to float32 at a time when scoring an int8 corpus (~3 MB at 1536-d)
+SIMILAR_SCORE_BLOCK = 512
+
+
+class SimilarCorpus:
+    """Stored embeddings, L2-normalized once, for the /similar numpy fallback."""
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        script_ids: List[int],
+        titles: List[str],
+        quantize: bool = SIMILAR_CORPUS_INT8
+    ):
+        # Normalize rows in place so scoring is a bare matrix-vector product
+        norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+        norms[norms == 0] = 1.0  # zero vectors score 0 instead of NaN
+        matrix /= norms[:, None]
+        
+        self.scale: Optional[np.ndarray] = None
+        if quantize:
+            # Symmetric scalar quantization: each row's largest |value| maps to 127
+            scale = np.abs(matrix).max(axis=1) / 127 if len(matrix) else np.ones(0, np.float32)
+            scale[scale == 0] = 1.0
+            matrix /= scale[:, None]
+            np.rint(matrix, out=matrix)
+            matrix = matrix.astype(np.int8)
+            self.scale = scale.astype(np.float32)
+        
+        self.matrix = matrix
+        self.script_ids = script_ids
+        self.titles = titles
+        self.rows = {script_id: row for row, script_id in enumerate(script_ids)}
+        self.loaded_at = time.monotonic()
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() - self.loaded_at < SIMILAR_CORPUS_TTL
+
+    def vector(self, row: int) -> np.ndarray:
+        """Return the (unit length) float32 embedding stored at row."""
+        if self.scale is None:
+            return self.matrix[row]
+        return self.matrix[row].astype(np.float32) * self.scale[row]
+
+    def scores(self, query_unit: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every stored row with a unit-length query."""
+        if self.scale is None:
+            return self.matrix @ query_unit
+        
+        # numpy has no BLAS path for integer matmul; widen cache-sized blocks
+        # to float32 and keep the product on SGEMV
+        scores = np.empty(len(self.matrix), dtype=np.float32)
+        for start in range(0, len(self.matrix), SIMILAR_SCORE_BLOCK):
+            block = self.matrix[start:start + SIMILAR_SCORE_BLOCK]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query_unit
+        return scores * self.scale
+
+
+_similar_corpus: Optional[SimilarCorpus] = None
+_similar_corpus_lock = asyncio.Lock()
+
+
+async def get_similar_corpus() -> SimilarCorpus:
+    """Return the cached corpus, reloading it (once, for all waiters) when stale."""
+    global _similar_corpus
+    
+    if _similar_corpus is not None and _similar_corpus.fresh:
+        return _similar_corpus
+    
+    async with _similar_corpus_lock:
+        if _similar_corpus is not None and _similar_corpus.fresh:
+            return _similar_corpus
+        corpus = SimilarCorpus(*await _load_embedding_matrix())
+        _similar_corpus = corpus
+        return corpus
+
+
+@app.post(
+    "/similar",
+    response_model=None,
+    responses={200: {"model": SimilarScriptsResponse}},
+    tags=["Search"]
+)
 async def find_similar_scripts(request: SimilarScriptsRequest):
     """Find scripts similar to a given script using vector similarity."""
     # Validate that either script_id or content is provided
@@ -1762,77 +2700,148 @@ async def find_similar_scripts(request: SimilarScriptsRequest):
             return {"similar_scripts": similar_scripts}
         
         # Otherwise use the database approach
-        conn = get_db_connection()
-        
-        # Get the embedding for the query script
-        query_embedding = None
-        
-        if request.script_id:
-            # Fetch embedding for existing script
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT embedding FROM script_embeddings WHERE script_id = %s",
-                (request.script_id,)
+        if not db_pool:
+            raise HTTPException(
+                status_code=503,
+                detail="Database connection pool is not available"
             )
-            result = cur.fetchone()
+        
+        if VECTOR_ENABLED and register_vector_async is not None:
+            # k-NN inside pgvector: the HNSW index on script_embeddings.embedding
+            # serves the ORDER BY, so only the top matches leave the database.
+            # When the halfvec index exists (HALFVEC_ENABLED), rank on that
+            # half-precision expression index (half the bytes per graph hop);
+            # similarity stays full precision.
+            params = {"exclude_id": request.script_id or 0, "limit": request.limit}
+            if request.script_id:
+                # The stored embedding never leaves the database
+                sql = SIMILAR_BY_ID_SQL[HALFVEC_ENABLED]
+                params["script_id"] = request.script_id
+            else:
+                # Generate embedding for provided content (no pooled connection held meanwhile)
+                query_embedding = await script_analyzer.generate_embedding_async(request.content)
+                sql = SIMILAR_SQL[HALFVEC_ENABLED]
+                params["query"] = np.asarray(query_embedding, dtype=np.float32)
+            
+            async with db_pool.connection() as conn:
+                if request.limit > HNSW_DEFAULT_EF_SEARCH:
+                    # Widen the candidate list for this transaction only, or the
+                    # index scan would stop short of the requested limit
+                    await conn.execute(
+                        "SELECT set_config('hnsw.ef_search', %s, true)",
+                        (str(request.limit),)
+                    )
+                cur = await conn.execute(sql, params, prepare=PREPARE_STATEMENTS)
+                rows = await cur.fetchall()
             
-            if not result:
+            # A missing query embedding leaves every distance NULL
+            if rows and rows[0]["similarity"] is None:
                 raise HTTPException(
                     status_code=404,
                     detail=f"No embedding found for script ID {request.script_id}"
                 )
             
-            query_embedding = result["embedding"]
+            return {
+                "similar_scripts": [
+                    {
+                        "script_id": row["script_id"],
+                        "title": row["title"],
+                        "similarity": float(row["similarity"])
+                    }
+                    for row in rows
+                ]
+            }
         
-        elif request.content:
-            # Generate embedding for provided content
-            query_embedding = script_analyzer.generate_embedding(request.content)
+        # Without pgvector operators, score against the in-memory corpus
+        corpus = await get_similar_corpus()
+        query_row = corpus.rows.get(request.script_id) if request.script_id else None
         
-        # Convert query embedding to numpy array
-        query_embedding_np = np.array(query_embedding)
+        if query_row is not None:
+            # Stored rows are already unit length
+            query_unit = corpus.vector(query_row)
+        else:
+            if request.script_id:
+                # Embedded after the corpus was loaded
+                async with db_pool.connection() as conn:
+                    cur = await conn.execute(
+                        "SELECT embedding FROM script_embeddings WHERE script_id = %s",
+                        (request.script_id,)
+                    )
+                    result = await cur.fetchone()
+                
+                if not result or result["embedding"] is None:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"No embedding found for script ID {request.script_id}"
+                    )
+                
+                query_embedding = _embedding_vector(result["embedding"])
+            else:
+                # Generate embedding for provided content (no pooled connection held meanwhile)
+                query_embedding = _embedding_vector(
+                    await script_analyzer.generate_embedding_async(request.content)
+                )
+            query_unit = query_embedding / (np.linalg.norm(query_embedding) or 1.0)
         
-        # Fetch all script embeddings from database
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT se.script_id, se.embedding, s.title
-            FROM script_embeddings se
-            JOIN scripts s ON se.script_id = s.id
-            WHERE se.script_id != %s
-        """, (request.script_id or 0,))
+        candidates = len(corpus.script_ids) - (query_row is not None)
+        if candidates <= 0:
+            return {"similar_scripts": []}
         
-        script_embeddings = cur.fetchall()
+        # One matrix-vector product against the pre-normalized rows
+        scores = corpus.scores(query_unit)
+        if query_row is not None:
+            scores[query_row] = -np.inf  # never match the query script itself
         
-        # Calculate similarities
-        similarities = []
-        for script in script_embeddings:
-            script_embedding = np.array(script["embedding"])
-            similarity = np.dot(query_embedding_np, script_embedding) / (
-                np.linalg.norm(query_embedding_np) * np.linalg.norm(script_embedding)
-            )
-            similarities.append({
-                "script_id": script["script_id"],
-                "title": script["title"],
-                "similarity": float(similarity)
-            })
+        # Select the top matches without sorting all N, then order just those
+        limit = min(request.limit, candidates)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
         
-        # Sort by similarity (highest first) and return top matches
-        similarities.sort(key=lambda x: x["similarity"], reverse=True)
-        top_similarities = similarities[:request.limit]
+        top_similarities = [
+            {
+                "script_id": corpus.script_ids[i],
+                "title": corpus.titles[i],
+                "similarity": float(scores[i])
+            }
+            for i in top
+        ]
         
         return {"similar_scripts": top_similarities}
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to find similar scripts: {str(e)}"
         )
-    finally:
-        if conn:
-            conn.close()
 
 
-@app.post("/visualize", response_model=VisualizationResponse, tags=["Visualization"])
-async def generate_visualization(request: VisualizationRequest):
+# pyplot keeps global figure state, so renders run one at a time; waiting on
+# this lock parks the request without tying up a worker thread
+_visualization_lock = asyncio.Lock()
+# Default filenames: a per-process prefix (start time and pid, since workers
+# share the output directory) plus a counter, so renders started in the same
+# second never overwrite each other
+_visualization_prefix = f"agent_network_{int(time.time())}_{os.getpid()}"
+_visualization_counter = itertools.count()
+
+
+@app.post(
+    "/visualize",
+    response_model=None,
+    responses={
+        200: {
+            "model": VisualizationResponse,
+            "content": {"image/png": {}}
+        }
+    },
+    tags=["Visualization"]
+)
+async def generate_visualization(
+    request: VisualizationRequest,
+    accept: Optional[str] = Header(None)
+):
     """
     Generate a visualization of the agent system.
     
@@ -1840,6 +2849,9 @@ async def generate_visualization(request: VisualizationRequest):
     - agent_network: Visualize the agent network
     - memory_graph: Visualize the memory graph
     - task_progress: Visualize task progress
+
+    Send `Accept: image/png` to receive the rendered image in the response
+    instead of its path, saving the client a second round trip.
     """
     if not agent_coordinator:
         raise HTTPException(
@@ -1851,10 +2863,15 @@ async def generate_visualization(request: VisualizationRequest):
         visualization_path = None
         
         if request.visualization_type == "agent_network":
-            filename = request.parameters.get("filename", 
-                                             f"agent_network_{int(time.time())}.png")
-            visualization_path = agent_coordinator.visualize_agent_network(
-                filename=filename)
+            filename = request.parameters.get("filename")
+            if not filename:
+                filename = f"{_visualization_prefix}_{next(_visualization_counter)}.png"
+            # Rendering and savefig are CPU and disk bound; keep them off the loop
+            async with _visualization_lock:
+                visualization_path = await asyncio.to_thread(
+                    agent_coordinator.visualize_agent_network,
+                    filename=filename
+                )
         
         elif request.visualization_type == "memory_graph":
             # This would call the appropriate visualization method
@@ -1878,11 +2895,17 @@ async def generate_visualization(request: VisualizationRequest):
                 detail="Failed to generate visualization"
             )
         
+        if accept and "image/png" in accept and os.path.isfile(visualization_path):
+            image = await asyncio.to_thread(Path(visualization_path).read_bytes)
+            return Response(content=image, media_type="image/png")
+
         return {
             "visualization_path": visualization_path,
             "visualization_type": request.visualization_type
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -1890,68 +2913,337 @@ async def generate_visualization(request: VisualizationRequest):
         )
 
 
-@app.get("/categories", tags=["Categories"])
-async def get_categories():
-    """Get the list of predefined script categories with IDs and descriptions."""
-    categories = [
-        {
-            "id": 1,
-            "name": "System Administration",
-            "description": "Scripts for managing Windows/Linux systems, including system configuration, maintenance, and monitoring."
-        },
-        {
-            "id": 2,
-            "name": "Security & Compliance",
-            "description": "Scripts for security auditing, hardening, compliance checks, vulnerability scanning, and implementing security best practices."
-        },
-        {
-            "id": 3,
-            "name": "Automation & DevOps",
-            "description": "Scripts that automate repetitive tasks, create workflows, CI/CD pipelines, and streamline IT processes."
-        },
-        {
-            "id": 4,
-            "name": "Cloud Management",
-            "description": "Scripts for managing resources on Azure, AWS, GCP, and other cloud platforms, including provisioning and configuration."
-        },
-        {
-            "id": 5,
-            "name": "Network Management",
-            "description": "Scripts for network configuration, monitoring, troubleshooting, and management of network devices and services."
-        },
-        {
-            "id": 6,
-            "name": "Data Management",
-            "description": "Scripts for database operations, data processing, ETL (Extract, Transform, Load), and data analysis tasks."
-        },
-        {
-            "id": 7,
-            "name": "Active Directory",
-            "description": "Scripts for managing Active Directory, user accounts, groups, permissions, and domain services."
-        },
-        {
-            "id": 8,
-            "name": "Monitoring & Diagnostics",
-            "description": "Scripts for system monitoring, logging, diagnostics, performance analysis, and alerting."
-        },
-        {
-            "id": 9,
-            "name": "Backup & Recovery",
-            "description": "Scripts for data backup, disaster recovery, system restore, and business continuity operations."
-        },
-        {
-            "id": 10,
-            "name": "Utilities & Helpers",
-            "description": "General-purpose utility scripts, helper functions, and reusable modules for various administrative tasks."
-        }
-    ]
-    
-    return {"categories": categories}
+# Predefined script categories; serialized once and served with an ETag
+CATEGORIES_JSON = orjson.dumps({"categories": CATEGORIES})
+CATEGORIES_ETAG = f'"{hashlib.md5(CATEGORIES_JSON).hexdigest()}"'
+# Static for the lifetime of a deploy: shared caches (CDN, proxy) may keep it
+# for a day and serve stale copies while they revalidate against the ETag.
+CATEGORIES_CACHE_CONTROL = "public, max-age=3600, s-maxage=86400, stale-while-revalidate=86400"
+
+
+@app.get("/categories", tags=["Categories"])
+async def get_categories(if_none_match: Optional[str] = Header(None)):
+    """Get the list of predefined script categories with IDs and descriptions."""
+    return cacheable_json(CATEGORIES_JSON, CATEGORIES_ETAG, CATEGORIES_CACHE_CONTROL, if_none_match)
+
+
+# Default /chat and /chat/stream system prompts. They only depend on the
+# static security guidelines, so they are built once at import.
+SECURITY_GUIDELINES = get_security_prompt_injection()
+
+DEFAULT_CHAT_SYSTEM_PROMPT = f"""You are PSScriptGPT, a specialized PowerShell expert assistant (January 2026).
+
+═══════════════════════════════════════════════════════════════════
+EXPERTISE AREAS
+═══════════════════════════════════════════════════════════════════
+- PowerShell scripting and automation (Windows PowerShell 5.1 & PowerShell 7.4+)
+- Script analysis, debugging, and optimization
+- Security best practices and vulnerability assessment
+- DevOps and CI/CD pipeline automation (GitHub Actions, Azure DevOps)
+- System administration and Active Directory
+- Cloud scripting (Azure Az module, AWS Tools, GCP SDK)
+- Cross-platform scripting (Windows, Linux, macOS)
+- Desired State Configuration (DSC v3)
+
+═══════════════════════════════════════════════════════════════════
+JANUARY 2026 BEST PRACTICES
+═══════════════════════════════════════════════════════════════════
+When providing code examples, always follow these modern patterns:
+
+**Modern Cmdlets:**
+- Use Get-CimInstance instead of Get-WmiObject (deprecated)
+- Use Invoke-RestMethod instead of Invoke-WebRequest for APIs
+- Use Test-Json for JSON validation (PS 7+)
+
+**PowerShell 7+ Features:**
+- Ternary operator: $result = $condition ? $true : $false
+- Null-coalescing: $value ?? 'default'
+- Pipeline parallelization: ForEach-Object -Parallel {{}}
+- ErrorView 'ConciseView' for cleaner errors
+- $PSStyle for ANSI color formatting
+
+**Security:**
+- Always recommend Get-Credential over plaintext passwords
+- Suggest SecretManagement module for secrets
+- Mention -WhatIf for any destructive operations
+- Warn about common security pitfalls
+
+**Testing & Quality:**
+- Reference PSScriptAnalyzer for linting
+- Mention Pester for unit testing
+- Suggest proper error handling patterns
+
+{SECURITY_GUIDELINES}
+
+═══════════════════════════════════════════════════════════════════
+RESPONSE GUIDELINES
+═══════════════════════════════════════════════════════════════════
+1. Provide accurate, tested code examples when relevant
+2. Explain concepts clearly with practical examples
+3. Highlight security considerations and best practices
+4. Suggest improvements and optimizations
+5. Reference official Microsoft documentation when helpful
+6. Use markdown code blocks with 'powershell' syntax highlighting
+7. For complex topics, break down the explanation step-by-step
+8. Always consider cross-platform compatibility when relevant
+
+═══════════════════════════════════════════════════════════════════
+I CAN HELP WITH:
+═══════════════════════════════════════════════════════════════════
+- Writing new scripts with production-ready patterns
+- Debugging existing scripts and error analysis
+- Explaining PowerShell concepts at any level
+- Reviewing code for security issues
+- Optimizing performance and memory usage
+- Converting scripts between platforms
+- Migrating from Windows PowerShell to PowerShell 7+
+- Setting up CI/CD pipelines for PowerShell projects"""
+
+DEFAULT_STREAM_SYSTEM_PROMPT = f"""You are PSScriptGPT, a specialized PowerShell expert assistant (January 2026).
+
+**EXPERTISE:** PowerShell scripting, automation, security, DevOps, cloud (Azure, AWS, GCP).
+
+**MODERN PATTERNS:**
+- Get-CimInstance over Get-WmiObject
+- PowerShell 7+ features (ternary, null-coalescing, parallel)
+- PSScriptAnalyzer and Pester for quality
+
+{SECURITY_GUIDELINES}"""
+
+
+# Script generation prompts: everything but the requirement lines is static,
+# so the large head and tail are built once at import.
+SCRIPT_GENERATION_PROMPT_HEAD = f"""You are PSScriptGPT, an expert PowerShell script generator.
+You create professional, production-ready PowerShell scripts following January 2026 best practices.
+
+═══════════════════════════════════════════════════════════════════
+SCRIPT GENERATION GUIDELINES (January 2026 Best Practices)
+═══════════════════════════════════════════════════════════════════
+
+**STRUCTURE & DOCUMENTATION:**
+1. Always include comprehensive comment-based help:
+   <# .SYNOPSIS, .DESCRIPTION, .PARAMETER, .EXAMPLE, .NOTES, .LINK #>
+2. Use [CmdletBinding(SupportsShouldProcess)] for functions with side effects
+3. Add #Requires statements for module dependencies and PowerShell version
+
+**MODERN POWERSHELL PATTERNS:**
+4. Use Get-CimInstance instead of Get-WmiObject (deprecated)
+5. Prefer splatting for commands with many parameters
+6. Use $PSScriptRoot for script-relative paths
+7. Implement PowerShell 7+ features when appropriate:
+   - Ternary operator: $result = $condition ? $true : $false
+   - Null-coalescing: $value ?? 'default'
+   - Pipeline parallelization: ForEach-Object -Parallel
+
+**PARAMETER VALIDATION:**
+8. Use comprehensive validation attributes:
+   [ValidateNotNullOrEmpty()], [ValidateRange()], [ValidatePattern()],
+   [ValidateSet()], [ValidateScript()], [ValidatePath()] (PS 7.4+)
+9. Declare parameter types explicitly
+10. Use [Parameter(Mandatory, ValueFromPipeline, etc.)]
+
+**ERROR HANDLING & LOGGING:**
+11. Implement structured error handling with try/catch/finally
+12. Use Write-Verbose -Message for progress (not Write-Host)
+13. Use Write-Warning for non-fatal issues
+14. Use Write-Error -ErrorAction Stop for fatal errors
+15. Consider $ErrorActionPreference = 'Stop' for strict mode
+
+**SAFETY & TESTING:**
+16. Support -WhatIf and -Confirm for destructive operations
+17. Design for testability with Pester
+18. Add PSScriptAnalyzer compatibility comments if needed
+19. Return proper objects, not formatted text
+
+{SECURITY_GUIDELINES}
+
+═══════════════════════════════════════════════════════════════════
+CHAIN-OF-THOUGHT SECURITY REVIEW (Before generating):
+═══════════════════════════════════════════════════════════════════
+Before generating any script, internally review:
+1. Could this script cause unintended data loss?
+2. Does it handle credentials securely (Get-Credential, not plaintext)?
+3. Are file/registry operations properly guarded with -WhatIf?
+4. Does it follow least-privilege principles?
+5. Are there any injection vulnerabilities in dynamic code?
+
+"""
+
+SCRIPT_GENERATION_PROMPT_TAIL = """═══════════════════════════════════════════════════════════════════
+OUTPUT FORMAT:
+═══════════════════════════════════════════════════════════════════
+1. **Purpose & Requirements Analysis** - Brief overview of what the script does
+2. **Prerequisites** - Required modules, permissions, PowerShell version
+3. **Complete Script** - Full, runnable code in ```powershell blocks
+4. **Key Features Explained** - Brief explanation of important sections
+5. **Usage Examples** - How to run the script with sample parameters
+6. **Testing Notes** - How to safely test (use -WhatIf first!)"""
+
+STREAM_SCRIPT_GENERATION_PROMPT_HEAD = f"""You are PSScriptGPT, an expert PowerShell script generator.
+You create professional, production-ready PowerShell scripts following January 2026 best practices.
+
+**KEY GUIDELINES:**
+1. Use Get-CimInstance instead of Get-WmiObject (deprecated)
+2. Include comprehensive comment-based help
+3. Use [CmdletBinding(SupportsShouldProcess)] for side effects
+4. Implement proper error handling with try/catch
+5. Support -WhatIf and -Confirm for destructive operations
+6. Use modern PowerShell 7+ features when appropriate
+
+{SECURITY_GUIDELINES}
+
+"""
+
+
+def script_generation_prompt(script_requirements: Optional[Dict[str, Any]]) -> str:
+    """/chat system prompt for a script generation request."""
+    if script_requirements:
+        target = sanitize_for_prompt(script_requirements.get('target_system', 'windows'))
+        complexity = sanitize_for_prompt(script_requirements.get('complexity', 'medium'))
+        features = ', '.join(sanitize_for_prompt(f) for f in script_requirements.get('features', []))
+    else:
+        target, complexity, features = 'windows', 'medium', 'standard'
+    return (
+        f"{SCRIPT_GENERATION_PROMPT_HEAD}"
+        f"TARGET SYSTEM: {target}\n"
+        f"COMPLEXITY LEVEL: {complexity}\n"
+        f"REQUESTED FEATURES: {features}\n\n"
+        f"{SCRIPT_GENERATION_PROMPT_TAIL}"
+    )
+
+
+def stream_script_generation_prompt(script_requirements: Optional[Dict[str, Any]]) -> str:
+    """/chat/stream system prompt for a script generation request."""
+    target = script_requirements.get('target_system', 'windows') if script_requirements else 'windows'
+    return f"{STREAM_SCRIPT_GENERATION_PROMPT_HEAD}TARGET: {target}"
+
+
+# Dumps a whole message list in one pydantic-core call
+CHAT_MESSAGES_ADAPTER = TypeAdapter(List[ChatMessage])
+
+
+def topic_guardrail_inputs(
+    messages: List[ChatMessage]
+) -> Tuple[str, Optional[List[Dict[str, str]]]]:
+    """
+    Latest user message and the earlier turns the topic validator reads.
+
+    The validator only looks at the last three earlier messages, so only those
+    are dumped; a rejected request never converts the rest of its history.
+    """
+    latest = next((m.content for m in reversed(messages) if m.role == "user"), "")
+    prior = CHAT_MESSAGES_ADAPTER.dump_python(messages[-4:-1]) if len(messages) > 1 else None
+    return latest, prior
+
+
+def is_cacheable_chat(request: ChatRequest) -> bool:
+    """
+    Only stateless single-turn requests are cacheable; history, sessions and
+    explicit agents all make the answer depend on more than the question.
+    """
+    return (
+        not request.no_cache
+        and len(request.messages) == 1
+        and request.messages[0].role == "user"
+        and not request.session_id
+        and not request.agent_type
+    )
+
+
+def chat_cache_scope(request: ChatRequest, endpoint: str = "chat") -> str:
+    """Semantic cache scope: answers are only shared between identical prompt setups."""
+    scope = f"{request.provider or ''}|{request.model or ''}|{request.system_prompt or ''}"
+    # /chat/stream uses its own system prompt and sampling settings
+    return scope if endpoint == "chat" else f"{endpoint}|{scope}"
 
 
-@app.post("/chat", response_model=ChatResponse, tags=["Chat"])
+# Idempotency layer for /chat: identical requests (retries, double-clicks)
+# within a short retry window reuse the first answer, and identical requests
+# that arrive while it is still being generated wait for it instead of calling
+# the model. Only stateless requests qualify (see is_idempotent_chat).
+CHAT_IDEMPOTENCY_TTL = int(os.getenv("CHAT_IDEMPOTENCY_TTL", "60"))  # seconds
+CHAT_IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("CHAT_IDEMPOTENCY_MAX_ENTRIES", "5000"))
+_chat_results: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_chat_inflight: Dict[bytes, asyncio.Future] = {}
+
+
+def is_idempotent_chat(request: ChatRequest) -> bool:
+    """
+    Agents and sessions keep conversation state server-side (assistant threads,
+    newly created session ids), so a repeated message there is a new turn for
+    that caller, not a retry; only stateless requests may share an answer.
+    """
+    return not request.no_cache and not request.session_id and not request.agent_type
+
+
+def chat_idempotency_key(request: ChatRequest, x_api_key: Optional[str]) -> bytes:
+    """Digest of everything a stateless /chat answer depends on (the caller's key included)."""
+    return hashlib.sha256(orjson.dumps([
+        [[m.role, m.content] for m in request.messages],
+        request.system_prompt,
+        request.model,
+        request.provider,
+        x_api_key or request.api_key
+    ])).digest()
+
+
+async def process_chat_request_once(
+    request: ChatRequest,
+    x_api_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """Run process_chat_request at most once per idempotency key and TTL window."""
+    key = chat_idempotency_key(request, x_api_key)
+
+    entry = _chat_results.get(key)
+    if entry is not None:
+        if entry[0] > time.monotonic():
+            _chat_results.move_to_end(key)
+            logger.info("Chat request served from idempotency cache")
+            return entry[1]
+        del _chat_results[key]
+
+    while (inflight := _chat_inflight.get(key)) is not None:
+        try:
+            # shield: a follower disconnecting must not cancel the leader's call
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise  # this request itself was cancelled
+            # The leader's client went away mid-call; take over (or join
+            # whichever follower already did) rather than failing with it
+
+    future = asyncio.get_running_loop().create_future()
+    _chat_inflight[key] = future
+    try:
+        result = await process_chat_request(request, x_api_key)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # mark retrieved when no follower is waiting
+        raise
+    finally:
+        _chat_inflight.pop(key, None)
+
+    future.set_result(result)
+    _chat_results[key] = (time.monotonic() + CHAT_IDEMPOTENCY_TTL, result)
+    while len(_chat_results) > CHAT_IDEMPOTENCY_MAX_ENTRIES:
+        _chat_results.popitem(last=False)
+    return result
+
+
+# /chat builds its {"response", "session_id"} dict itself (or serves it from the
+# semantic cache), so ChatResponse only documents the schema.
+@app.post(
+    "/chat",
+    response_model=None,
+    responses={200: {"model": ChatResponse}},
+    tags=["Chat"]
+)
 async def chat_with_powershell_expert(
     request: ChatRequest,
+    background_tasks: BackgroundTasks,
     x_api_key: Optional[str] = Header(None, alias="x-api-key")
 ):
     """
@@ -1961,9 +3253,49 @@ async def chat_with_powershell_expert(
     - Topic guardrails: Validates requests are PowerShell/scripting related
     - Script generation: Can create new PowerShell scripts from requirements
     - Context-aware: Uses conversation history for better responses
+    - Semantic cache: Single-turn questions are answered from cache when an
+      identical or near-identical question was asked recently
+    - Idempotency: an identical stateless request (same messages, prompt, model
+      and key; no session_id or agent_type) retried within a minute, or sent
+      while the first is running, reuses its answer (set no_cache to bypass both caches)
 
     API Key: Pass via X-API-Key header (recommended) or use server-configured key.
     """
+    if not is_idempotent_chat(request):
+        return await process_chat_request(request, x_api_key)
+    if not is_cacheable_chat(request):
+        return await process_chat_request_once(request, x_api_key)
+
+    question = request.messages[0].content
+    cache_scope = chat_cache_scope(request)
+
+    cached = await chat_cache.get(
+        question,
+        embed=script_analyzer.generate_embedding_async,
+        scope=cache_scope
+    )
+    if cached is not None:
+        logger.info("Chat request served from semantic cache")
+        return cached
+
+    result = await process_chat_request_once(request, x_api_key)
+    # Store after the response is sent so the embedding call and Redis write
+    # never delay the answer
+    background_tasks.add_task(
+        chat_cache.set,
+        question,
+        result,
+        embed=script_analyzer.generate_embedding_async,
+        scope=cache_scope
+    )
+    return result
+
+
+async def process_chat_request(
+    request: ChatRequest,
+    x_api_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """Run a chat request through guardrails and the selected provider/agent."""
     start_time = time.time()
     try:
         # SECURITY: API key from header takes precedence (safer than body)
@@ -1971,21 +3303,12 @@ async def chat_with_powershell_expert(
         api_key = x_api_key or config.api_keys.openai
 
         # Get the latest user message for guardrail validation
-        latest_user_message = ""
-        conversation_history = []
-        for msg in request.messages:
-            msg_dict = msg.dict() if hasattr(msg, 'dict') else msg
-            conversation_history.append(msg_dict)
-            if msg_dict.get('role') == 'user':
-                latest_user_message = msg_dict.get('content', '')
+        latest_user_message, recent_history = topic_guardrail_inputs(request.messages)
 
         # =====================================================
         # GUARDRAIL: Topic Validation (January 2026 Best Practice)
         # =====================================================
-        validation_result = validate_powershell_topic(
-            latest_user_message,
-            conversation_history[:-1] if len(conversation_history) > 1 else None
-        )
+        validation_result = validate_powershell_topic(latest_user_message, recent_history)
 
         logger.info(f"Topic validation: valid={validation_result.is_valid}, "
                    f"category={validation_result.category.value}, "
@@ -2025,147 +3348,15 @@ async def chat_with_powershell_expert(
                     "session_id": request.session_id
                 }
 
-        # Get security prompt injection for safe code generation
-        security_guidelines = get_security_prompt_injection()
+        # Past the guardrails: dump the full history once for prompts and agents
+        conversation_history = CHAT_MESSAGES_ADAPTER.dump_python(request.messages)
 
         # Build the appropriate system prompt
         if is_script_request:
-            system_prompt = f"""You are PSScriptGPT, an expert PowerShell script generator.
-You create professional, production-ready PowerShell scripts following January 2026 best practices.
-
-═══════════════════════════════════════════════════════════════════
-SCRIPT GENERATION GUIDELINES (January 2026 Best Practices)
-═══════════════════════════════════════════════════════════════════
-
-**STRUCTURE & DOCUMENTATION:**
-1. Always include comprehensive comment-based help:
-   <# .SYNOPSIS, .DESCRIPTION, .PARAMETER, .EXAMPLE, .NOTES, .LINK #>
-2. Use [CmdletBinding(SupportsShouldProcess)] for functions with side effects
-3. Add #Requires statements for module dependencies and PowerShell version
-
-**MODERN POWERSHELL PATTERNS:**
-4. Use Get-CimInstance instead of Get-WmiObject (deprecated)
-5. Prefer splatting for commands with many parameters
-6. Use $PSScriptRoot for script-relative paths
-7. Implement PowerShell 7+ features when appropriate:
-   - Ternary operator: $result = $condition ? $true : $false
-   - Null-coalescing: $value ?? 'default'
-   - Pipeline parallelization: ForEach-Object -Parallel
-
-**PARAMETER VALIDATION:**
-8. Use comprehensive validation attributes:
-   [ValidateNotNullOrEmpty()], [ValidateRange()], [ValidatePattern()],
-   [ValidateSet()], [ValidateScript()], [ValidatePath()] (PS 7.4+)
-9. Declare parameter types explicitly
-10. Use [Parameter(Mandatory, ValueFromPipeline, etc.)]
-
-**ERROR HANDLING & LOGGING:**
-11. Implement structured error handling with try/catch/finally
-12. Use Write-Verbose -Message for progress (not Write-Host)
-13. Use Write-Warning for non-fatal issues
-14. Use Write-Error -ErrorAction Stop for fatal errors
-15. Consider $ErrorActionPreference = 'Stop' for strict mode
-
-**SAFETY & TESTING:**
-16. Support -WhatIf and -Confirm for destructive operations
-17. Design for testability with Pester
-18. Add PSScriptAnalyzer compatibility comments if needed
-19. Return proper objects, not formatted text
-
-{security_guidelines}
-
-═══════════════════════════════════════════════════════════════════
-CHAIN-OF-THOUGHT SECURITY REVIEW (Before generating):
-═══════════════════════════════════════════════════════════════════
-Before generating any script, internally review:
-1. Could this script cause unintended data loss?
-2. Does it handle credentials securely (Get-Credential, not plaintext)?
-3. Are file/registry operations properly guarded with -WhatIf?
-4. Does it follow least-privilege principles?
-5. Are there any injection vulnerabilities in dynamic code?
-
-TARGET SYSTEM: {sanitize_for_prompt(script_requirements.get('target_system', 'windows')) if script_requirements else 'windows'}
-COMPLEXITY LEVEL: {sanitize_for_prompt(script_requirements.get('complexity', 'medium')) if script_requirements else 'medium'}
-REQUESTED FEATURES: {', '.join(sanitize_for_prompt(f) for f in script_requirements.get('features', [])) if script_requirements else 'standard'}
-
-═══════════════════════════════════════════════════════════════════
-OUTPUT FORMAT:
-═══════════════════════════════════════════════════════════════════
-1. **Purpose & Requirements Analysis** - Brief overview of what the script does
-2. **Prerequisites** - Required modules, permissions, PowerShell version
-3. **Complete Script** - Full, runnable code in ```powershell blocks
-4. **Key Features Explained** - Brief explanation of important sections
-5. **Usage Examples** - How to run the script with sample parameters
-6. **Testing Notes** - How to safely test (use -WhatIf first!)"""
+            system_prompt = script_generation_prompt(script_requirements)
         else:
             # Standard PowerShell assistant prompt (January 2026)
-            system_prompt = request.system_prompt or f"""You are PSScriptGPT, a specialized PowerShell expert assistant (January 2026).
-
-═══════════════════════════════════════════════════════════════════
-EXPERTISE AREAS
-═══════════════════════════════════════════════════════════════════
-- PowerShell scripting and automation (Windows PowerShell 5.1 & PowerShell 7.4+)
-- Script analysis, debugging, and optimization
-- Security best practices and vulnerability assessment
-- DevOps and CI/CD pipeline automation (GitHub Actions, Azure DevOps)
-- System administration and Active Directory
-- Cloud scripting (Azure Az module, AWS Tools, GCP SDK)
-- Cross-platform scripting (Windows, Linux, macOS)
-- Desired State Configuration (DSC v3)
-
-═══════════════════════════════════════════════════════════════════
-JANUARY 2026 BEST PRACTICES
-═══════════════════════════════════════════════════════════════════
-When providing code examples, always follow these modern patterns:
-
-**Modern Cmdlets:**
-- Use Get-CimInstance instead of Get-WmiObject (deprecated)
-- Use Invoke-RestMethod instead of Invoke-WebRequest for APIs
-- Use Test-Json for JSON validation (PS 7+)
-
-**PowerShell 7+ Features:**
-- Ternary operator: $result = $condition ? $true : $false
-- Null-coalescing: $value ?? 'default'
-- Pipeline parallelization: ForEach-Object -Parallel {{}}
-- ErrorView 'ConciseView' for cleaner errors
-- $PSStyle for ANSI color formatting
-
-**Security:**
-- Always recommend Get-Credential over plaintext passwords
-- Suggest SecretManagement module for secrets
-- Mention -WhatIf for any destructive operations
-- Warn about common security pitfalls
-
-**Testing & Quality:**
-- Reference PSScriptAnalyzer for linting
-- Mention Pester for unit testing
-- Suggest proper error handling patterns
-
-{security_guidelines}
-
-═══════════════════════════════════════════════════════════════════
-RESPONSE GUIDELINES
-═══════════════════════════════════════════════════════════════════
-1. Provide accurate, tested code examples when relevant
-2. Explain concepts clearly with practical examples
-3. Highlight security considerations and best practices
-4. Suggest improvements and optimizations
-5. Reference official Microsoft documentation when helpful
-6. Use markdown code blocks with 'powershell' syntax highlighting
-7. For complex topics, break down the explanation step-by-step
-8. Always consider cross-platform compatibility when relevant
-
-═══════════════════════════════════════════════════════════════════
-I CAN HELP WITH:
-═══════════════════════════════════════════════════════════════════
-- Writing new scripts with production-ready patterns
-- Debugging existing scripts and error analysis
-- Explaining PowerShell concepts at any level
-- Reviewing code for security issues
-- Optimizing performance and memory usage
-- Converting scripts between platforms
-- Migrating from Windows PowerShell to PowerShell 7+
-- Setting up CI/CD pipelines for PowerShell projects"""
+            system_prompt = request.system_prompt or DEFAULT_CHAT_SYSTEM_PROMPT
 
         # Determine provider from request or infer from model ID
         requested_provider = request.provider
@@ -2183,17 +3374,6 @@ I CAN HELP WITH:
             if not api_key and not config.api_keys.anthropic:
                 raise HTTPException(status_code=503, detail="AI provider is not configured")
 
-        # Convert messages to the format expected by the agent system
-        messages = []
-
-        # Add the system prompt
-        messages.append({"role": "system", "content": system_prompt})
-
-        # Add user messages
-        for msg in request.messages:
-            msg_dict = msg.dict() if hasattr(msg, 'dict') else msg
-            messages.append({"role": msg_dict.get('role'), "content": msg_dict.get('content')})
-
         # Session ID for persistent conversations
         session_id = request.session_id or None
 
@@ -2207,7 +3387,7 @@ I CAN HELP WITH:
                 )
                 if agent:
                     # Build history from user/assistant messages (skip system prompt entry)
-                    chat_history = [{"role": m["role"], "content": m["content"]} for m in messages[1:-1]] if len(messages) > 2 else None
+                    chat_history = conversation_history[:-1] if len(conversation_history) > 1 else None
                     response = await agent.chat(
                         message=latest_user_message,
                         context=None,
@@ -2223,6 +3403,10 @@ I CAN HELP WITH:
                 logger.warning("Anthropic agent not available, falling back to OpenAI")
                 # Fall through to OpenAI handling below
 
+        # Convert messages to the format expected by the OpenAI paths below
+        # (the Anthropic agent takes the prompt and history separately)
+        messages = [{"role": "system", "content": system_prompt}, *conversation_history]
+
         # Process the chat request with OpenAI-based agents.
         # If a specific OpenAI model was requested, use direct completion
         # instead of the agent coordinator (which manages its own model selection).
@@ -2261,29 +3445,23 @@ I CAN HELP WITH:
             logger.info(f"Chat request processed in {processing_time:.2f}s (agent coordinator)")
             return {"response": response, "session_id": session_id}
         elif request.agent_type == "assistant":
-            # Use the OpenAI Assistant agent
-            try:
-                from agents.openai_assistant_agent import OpenAIAssistantAgent
+            if OpenAIAssistantAgent is None:
+                logger.warning("OpenAI Assistant agent not available; falling back to legacy agent system")
+                response = await agent_factory.process_message(messages, api_key)
+                return {"response": response, "session_id": session_id}
 
-                # Create an assistant agent
-                assistant_agent = OpenAIAssistantAgent(api_key=api_key)
+            assistant_agent = await get_assistant_agent(api_key)
 
-                # Process the message with the assistant agent
-                response = await assistant_agent.process_message(messages, session_id)
+            # Name the session up front so the thread process_message creates
+            # is the one the client continues (no second thread round trip)
+            if not session_id:
+                session_id = str(uuid.uuid4())
 
-                # Get the session ID for the response
-                if not session_id:
-                    session_id = assistant_agent.get_or_create_thread()
+            response = await assistant_agent.process_message(messages, session_id)
 
-                processing_time = time.time() - start_time
-                logger.info(f"Chat request processed in {processing_time:.2f}s (assistant agent)")
-                return {"response": response, "session_id": session_id}
-            except ImportError as e:
-                logger.warning(f"OpenAI Assistant agent not available: {e}")
-                logger.info("Falling back to legacy agent system")
-                # Fall back to legacy agent
-                response = await agent_factory.process_message(messages, api_key)
-                return {"response": response, "session_id": session_id}
+            processing_time = time.time() - start_time
+            logger.info(f"Chat request processed in {processing_time:.2f}s (assistant agent)")
+            return {"response": response, "session_id": session_id}
         else:
             # Use the agent factory with specified or auto-detected agent type
             response = await agent_factory.process_message(
@@ -2301,6 +3479,19 @@ I CAN HELP WITH:
         raise HTTPException(status_code=500, detail="Chat processing failed. Please try again.")
 
 
+def _sse(payload: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Events frame."""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+# Token frames for the fixed guardrail guidance, encoded once instead of
+# re-serializing the same few hundred bytes for every rejected message
+GUIDANCE_FRAMES = MappingProxyType({
+    text: _sse({'type': 'token', 'content': text})
+    for text in (OFF_TOPIC_RESPONSE, UNCLEAR_TOPIC_RESPONSE)
+})
+
+
 @app.post("/chat/stream", tags=["Chat"])
 async def stream_chat_with_powershell_expert(
     request: ChatRequest,
@@ -2315,12 +3506,13 @@ async def stream_chat_with_powershell_expert(
     SSE Event Types:
     - token: Individual token in the stream
     - error: Error message
-    - done: Stream complete with metadata
+    - done: Stream complete with metadata (cached: true when served from cache)
+
+    Single-turn questions share the semantic cache with /chat (set no_cache
+    to bypass); a cache hit is sent as one token event.
 
     API Key: Pass via X-API-Key header (recommended) or use server-configured key.
     """
-    import asyncio
-
     # Determine provider from request model
     requested_model = request.model
     requested_provider = request.provider
@@ -2333,35 +3525,57 @@ async def stream_chat_with_powershell_expert(
     else:
         resolved_api_key = x_api_key or config.api_keys.openai
 
+    # Single-turn answers are shared through the semantic cache like /chat;
+    # the full text is stored after the response closes, off the stream.
+    cacheable = is_cacheable_chat(request)
+    cache_scope = chat_cache_scope(request, endpoint="chat/stream")
+    streamed_parts: List[str] = []
+    stream_completed = False
+
+    async def cache_streamed_answer():
+        if not (cacheable and stream_completed and streamed_parts):
+            return
+        await chat_cache.set(
+            request.messages[0].content,
+            {"response": "".join(streamed_parts), "session_id": None},
+            embed=script_analyzer.generate_embedding_async,
+            scope=cache_scope
+        )
+
     async def generate_stream():
         """Async generator for SSE streaming."""
+        nonlocal stream_completed
         try:
             api_key = resolved_api_key
             if not api_key:
                 provider_label = "Anthropic" if requested_provider == "anthropic" else "OpenAI"
-                yield f"data: {json.dumps({'type': 'error', 'content': f'No {provider_label} API key configured'})}\n\n"
+                yield _sse({'type': 'error', 'content': f'No {provider_label} API key configured'})
                 return
 
+            if cacheable:
+                cached = await chat_cache.get(
+                    request.messages[0].content,
+                    embed=script_analyzer.generate_embedding_async,
+                    scope=cache_scope
+                )
+                if cached is not None:
+                    logger.info("Streaming chat request served from semantic cache")
+                    yield _sse({'type': 'token', 'content': cached["response"]})
+                    yield _sse({'type': 'done', 'session_id': request.session_id, 'cached': True})
+                    return
+
             # Get the latest user message for guardrail validation
-            latest_user_message = ""
-            conversation_history = []
-            for msg in request.messages:
-                msg_dict = msg.dict() if hasattr(msg, 'dict') else msg
-                conversation_history.append(msg_dict)
-                if msg_dict.get('role') == 'user':
-                    latest_user_message = msg_dict.get('content', '')
+            latest_user_message, recent_history = topic_guardrail_inputs(request.messages)
 
             # =====================================================
             # GUARDRAIL: Topic Validation
             # =====================================================
-            validation_result = validate_powershell_topic(
-                latest_user_message,
-                conversation_history[:-1] if len(conversation_history) > 1 else None
-            )
+            validation_result = validate_powershell_topic(latest_user_message, recent_history)
 
             if not validation_result.is_valid:
-                yield f"data: {json.dumps({'type': 'token', 'content': validation_result.suggested_response})}\n\n"
-                yield f"data: {json.dumps({'type': 'done', 'session_id': request.session_id})}\n\n"
+                guidance = validation_result.suggested_response
+                yield GUIDANCE_FRAMES.get(guidance) or _sse({'type': 'token', 'content': guidance})
+                yield _sse({'type': 'done', 'session_id': request.session_id})
                 return
 
             # =====================================================
@@ -2370,51 +3584,24 @@ async def stream_chat_with_powershell_expert(
             is_valid_request, _, removed_patterns = security_guard.validate_request(latest_user_message)
             if not is_valid_request:
                 error_msg = f"Your request contained potentially dangerous patterns that were blocked: {', '.join(removed_patterns)}"
-                yield f"data: {json.dumps({'type': 'token', 'content': error_msg})}\n\n"
-                yield f"data: {json.dumps({'type': 'done', 'session_id': request.session_id})}\n\n"
+                yield _sse({'type': 'token', 'content': error_msg})
+                yield _sse({'type': 'done', 'session_id': request.session_id})
                 return
 
+            # Past the guardrails: dump the full history once for the provider call
+            conversation_history = CHAT_MESSAGES_ADAPTER.dump_python(request.messages)
+
             # Build system prompt (same logic as /chat endpoint)
             is_script_request = is_script_generation_request(latest_user_message)
             script_requirements = extract_script_requirements(latest_user_message) if is_script_request else None
-            security_guidelines = get_security_prompt_injection()
 
             if is_script_request:
-                system_prompt = f"""You are PSScriptGPT, an expert PowerShell script generator.
-You create professional, production-ready PowerShell scripts following January 2026 best practices.
-
-**KEY GUIDELINES:**
-1. Use Get-CimInstance instead of Get-WmiObject (deprecated)
-2. Include comprehensive comment-based help
-3. Use [CmdletBinding(SupportsShouldProcess)] for side effects
-4. Implement proper error handling with try/catch
-5. Support -WhatIf and -Confirm for destructive operations
-6. Use modern PowerShell 7+ features when appropriate
-
-{security_guidelines}
-
-TARGET: {script_requirements.get('target_system', 'windows') if script_requirements else 'windows'}"""
+                system_prompt = stream_script_generation_prompt(script_requirements)
             else:
-                system_prompt = f"""You are PSScriptGPT, a specialized PowerShell expert assistant (January 2026).
-
-**EXPERTISE:** PowerShell scripting, automation, security, DevOps, cloud (Azure, AWS, GCP).
-
-**MODERN PATTERNS:**
-- Get-CimInstance over Get-WmiObject
-- PowerShell 7+ features (ternary, null-coalescing, parallel)
-- PSScriptAnalyzer and Pester for quality
-
-{security_guidelines}"""
-
-            # Build messages
-            messages = [{"role": "system", "content": system_prompt}]
-            for msg in request.messages:
-                msg_dict = msg.dict() if hasattr(msg, 'dict') else msg
-                messages.append({"role": msg_dict.get('role'), "content": msg_dict.get('content')})
+                system_prompt = DEFAULT_STREAM_SYSTEM_PROMPT
 
             start_time = time.time()
             total_tokens = 0
-            full_response = ""
 
             if requested_provider == "anthropic":
                 # Stream from Anthropic Claude
@@ -2422,7 +3609,7 @@ TARGET: {script_requirements.get('target_system', 'windows') if script_requireme
                     from anthropic import AsyncAnthropic
                     anthropic_client = AsyncAnthropic(api_key=api_key)
                     # Build user/assistant messages (no system role for Anthropic)
-                    claude_messages = [m for m in messages if m["role"] != "system"]
+                    claude_messages = [m for m in conversation_history if m["role"] != "system"]
                     model_id = requested_model or config.agent.claude_model
 
                     async with anthropic_client.messages.stream(
@@ -2432,20 +3619,21 @@ TARGET: {script_requirements.get('target_system', 'windows') if script_requireme
                         messages=claude_messages,
                     ) as stream:
                         async for text in stream.text_stream:
-                            full_response += text
                             total_tokens += 1
-                            yield f"data: {json.dumps({'type': 'token', 'content': text})}\n\n"
+                            streamed_parts.append(text)
+                            yield _sse({'type': 'token', 'content': text})
                 except ImportError:
-                    yield f"data: {json.dumps({'type': 'error', 'content': 'Anthropic package not installed'})}\n\n"
+                    yield _sse({'type': 'error', 'content': 'Anthropic package not installed'})
                     return
                 except Exception as anthropic_err:
                     logger.error(f"Anthropic streaming error: {anthropic_err}", exc_info=True)
-                    yield f"data: {json.dumps({'type': 'error', 'content': 'Claude streaming failed. Please try again.'})}\n\n"
+                    yield _sse({'type': 'error', 'content': 'Claude streaming failed. Please try again.'})
                     return
             else:
                 # Stream from OpenAI (reuse cached client)
                 client = _get_openai_client(api_key)
                 model_id = requested_model or config.agent.default_model
+                messages = [{"role": "system", "content": system_prompt}, *conversation_history]
 
                 # o-series models: no temperature, use max_completion_tokens
                 is_o_series = bool(re.match(r'^o\d', model_id))
@@ -2466,19 +3654,20 @@ TARGET: {script_requirements.get('target_system', 'windows') if script_requireme
                     if chunk.choices and len(chunk.choices) > 0:
                         delta = chunk.choices[0].delta
                         if delta.content:
-                            full_response += delta.content
                             total_tokens += 1
-                            yield f"data: {json.dumps({'type': 'token', 'content': delta.content})}\n\n"
+                            streamed_parts.append(delta.content)
+                            yield _sse({'type': 'token', 'content': delta.content})
 
             # Stream complete - send done event with metadata
             processing_time = time.time() - start_time
             logger.info(f"Streaming chat completed in {processing_time:.2f}s, ~{total_tokens} tokens (provider={requested_provider})")
 
-            yield f"data: {json.dumps({'type': 'done', 'session_id': request.session_id, 'tokens': total_tokens, 'time': round(processing_time, 2)})}\n\n"
+            stream_completed = True
+            yield _sse({'type': 'done', 'session_id': request.session_id, 'tokens': total_tokens, 'time': round(processing_time, 2)})
 
         except Exception as e:
             logger.error(f"Streaming error: {e}", exc_info=True)
-            yield f"data: {json.dumps({'type': 'error', 'content': 'Streaming failed. Please try again.'})}\n\n"
+            yield _sse({'type': 'error', 'content': 'Streaming failed. Please try again.'})
 
     return StreamingResponse(
         generate_stream(),
@@ -2487,43 +3676,84 @@ TARGET: {script_requirements.get('target_system', 'windows') if script_requireme
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",  # Disable nginx buffering
+            "Content-Encoding": "identity",  # Keep GZipMiddleware from buffering frames
             "Access-Control-Allow-Origin": "*"
-        }
+        },
+        background=BackgroundTask(cache_streamed_answer)
     )
 
 
 # Token Usage and Cost Endpoints
+# Serialized token usage views keyed by (view, limit): (counter version, body, ETag).
+# Dashboards poll these every few seconds while the counter changes far less
+# often, so each view is encoded once per change and unchanged polls get a 304.
+_token_usage_views: Dict[Tuple[str, int], Tuple[int, bytes, str]] = {}
+# Clients must revalidate, but an ETag match costs no encoding work
+TOKEN_USAGE_CACHE_CONTROL = "no-cache"
+
+
+def token_usage_json(view: str, limit: int, build: Callable[[], Any]) -> Tuple[bytes, str]:
+    """Return the serialized body and ETag for a view, rebuilding it only after usage changes."""
+    version = token_counter.version
+    cached = _token_usage_views.get((view, limit))
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+    
+    body = orjson.dumps(build(), option=ORJSON_OPTIONS)
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    _token_usage_views[(view, limit)] = (version, body, etag)
+    return body, etag
+
+
 @app.get("/api/token-usage/summary", tags=["Token Usage"])
-async def get_token_usage_summary():
+async def get_token_usage_summary(if_none_match: Optional[str] = Header(None)):
     """Get summary of token usage and costs."""
     try:
-        summary = token_counter.get_usage_summary()
-        return summary
+        body, etag = token_usage_json("summary", 0, token_counter.get_usage_summary)
+        return cacheable_json(body, etag, TOKEN_USAGE_CACHE_CONTROL, if_none_match)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get usage summary: {str(e)}")
 
 
 @app.get("/api/token-usage/recent", tags=["Token Usage"])
-async def get_recent_usage(limit: int = Query(10, ge=1, le=100)):
+async def get_recent_usage(
+    limit: int = Query(10, ge=1, le=100),
+    if_none_match: Optional[str] = Header(None)
+):
     """Get recent token usage sessions."""
     try:
-        sessions = token_counter.get_recent_sessions(limit=limit)
-        return {"sessions": sessions}
+        body, etag = token_usage_json(
+            "recent", limit,
+            lambda: {"sessions": token_counter.get_recent_sessions(limit=limit)}
+        )
+        return cacheable_json(body, etag, TOKEN_USAGE_CACHE_CONTROL, if_none_match)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get recent usage: {str(e)}")
 
 
+# Inputs up to this length are tokenized inline; a thread hop costs more
+TOKENIZE_INLINE_CHARS = 16_384
+
+
 class CostEstimateRequest(BaseModel):
     model: str = Field(..., description="Model name to estimate cost for")
     input_text: str = Field(..., description="Input text to estimate tokens")
     estimated_output_tokens: int = Field(500, description="Estimated output tokens")
 
 
-@app.post("/api/token-usage/estimate", tags=["Token Usage"])
-async def estimate_cost(request: CostEstimateRequest):
+@app.post(
+    "/api/token-usage/estimate",
+    tags=["Token Usage"],
+    openapi_extra=json_body_openapi(CostEstimateRequest)
+)
+async def estimate_cost(request: CostEstimateRequest = Depends(json_body(CostEstimateRequest))):
     """Estimate cost for a potential API call."""
     try:
-        input_tokens = estimate_tokens(request.input_text)
+        if len(request.input_text) > TOKENIZE_INLINE_CHARS:
+            # tiktoken releases the GIL; keep long inputs off the event loop
+            input_tokens = await asyncio.to_thread(estimate_tokens, request.input_text)
+        else:
+            input_tokens = estimate_tokens(request.input_text)
         estimate = token_counter.estimate_cost(
             model=request.model,
             estimated_input_tokens=input_tokens,
@@ -2545,30 +3775,54 @@ async def reset_usage():
 
 
 # API Key Management Endpoints
+# Frontends poll key status; clients revalidate every time and get a 304
+# while the key is unchanged
+KEY_STATUS_CACHE_CONTROL = "no-cache"
+# (key, body, etag) for the configured key, rebuilt only when the key changes
+_key_status_payload: Optional[Tuple[str, bytes, str]] = None
+# The unconfigured status never varies, so it is serialized once
+UNCONFIGURED_KEY_STATUS_JSON = orjson.dumps({
+    "configured": False,
+    "masked_key": None,
+    "mock_mode": False
+})
+UNCONFIGURED_KEY_STATUS_ETAG = f'"{hashlib.md5(UNCONFIGURED_KEY_STATUS_JSON).hexdigest()}"'
+
+
+def configured_key_status_json(api_key: str) -> Tuple[bytes, str]:
+    """Serialized /api/key/status body and ETag for a configured key."""
+    global _key_status_payload
+    if _key_status_payload is None or _key_status_payload[0] != api_key:
+        body = orjson.dumps({
+            "configured": True,
+            "masked_key": api_key_manager.mask_key(api_key),
+            "mock_mode": False
+        })
+        _key_status_payload = (api_key, body, f'"{hashlib.md5(body).hexdigest()}"')
+    return _key_status_payload[1], _key_status_payload[2]
+
+
 @app.get("/api/key/status", tags=["API Key"])
-async def get_api_key_status():
+async def get_api_key_status(if_none_match: Optional[str] = Header(None)):
     """Check if API key is configured."""
     api_key = api_key_manager.get_api_key(prompt_if_missing=False)
     if api_key:
-        masked_key = f"{api_key[:7]}...{api_key[-4:]}"
-        return {
-            "configured": True,
-            "masked_key": masked_key,
-            "mock_mode": False
-        }
-    return {
-        "configured": False,
-        "masked_key": None,
-        "mock_mode": False
-    }
+        body, etag = configured_key_status_json(api_key)
+        return cacheable_json(body, etag, KEY_STATUS_CACHE_CONTROL, if_none_match)
+    return cacheable_json(
+        UNCONFIGURED_KEY_STATUS_JSON,
+        UNCONFIGURED_KEY_STATUS_ETAG,
+        KEY_STATUS_CACHE_CONTROL,
+        if_none_match
+    )
 
 
 class APIKeyRequest(BaseModel):
     api_key: str = Field(..., description="OpenAI API key")
 
 
-@app.post("/api/key/set", tags=["API Key"])
-async def set_api_key(request: APIKeyRequest):
+@app.post("/api/key/set", tags=["API Key"], openapi_extra=json_body_openapi(APIKeyRequest))
+async def set_api_key(request: APIKeyRequest = Depends(json_body(APIKeyRequest))):
     """Set or update the OpenAI API key."""
     try:
         if not api_key_manager.validate_key_format(request.api_key):
@@ -2582,7 +3836,7 @@ async def set_api_key(request: APIKeyRequest):
             os.environ["OPENAI_API_KEY"] = request.api_key
             return {
                 "message": "API key saved successfully",
-                "masked_key": f"{request.api_key[:7]}...{request.api_key[-4:]}"
+                "masked_key": api_key_manager.mask_key(request.api_key)
             }
         else:
             raise HTTPException(status_code=500, detail="Failed to save API key")
@@ -2596,7 +3850,7 @@ async def set_api_key(request: APIKeyRequest):
 async def test_api_key():
     """Test if the current API key is valid."""
     try:
-        is_valid = api_key_manager.test_key()
+        is_valid = await api_key_manager.test_key_async()
         return {
             "valid": is_valid,
             "message": "API key is valid" if is_valid else "API key is invalid or not configured"
@@ -2696,6 +3950,14 @@ async def get_error_stats():
         raise HTTPException(status_code=500, detail=f"Failed to get error stats: {str(e)}")
 
 
+@app.get("/api/embeddings/cache/stats", tags=["Monitoring"])
+async def get_embedding_cache_stats():
+    """Get in-process embedding cache statistics."""
+    return {
+        "embedding_cache": script_analyzer.embedding_lru.stats()
+    }
+
+
 @app.get("/api/health/detailed", tags=["Health"])
 async def detailed_health_check():
     """
@@ -2763,3 +4025,31 @@ async def get_model_configuration():
         "temperature": config.agent.temperature,
         "max_tokens": config.agent.max_tokens
     }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    reload = os.getenv("AI_RELOAD", "false").lower() == "true"
+
+    # Prefer uvloop and the httptools parser; fall back to the pure-Python
+    # implementations where they are not installed (e.g. Windows dev boxes).
+    # A single worker by default: the runtime API key set via /api/key/set,
+    # batch job status, LangGraph checkpoints, assistant threads and the token
+    # usage file all live in process memory, so with several workers requests
+    # land on a process that lacks them (and token_usage.json loses counts).
+    # WEB_CONCURRENCY > 1 is opt-in for deployments that accept this; each
+    # worker then has its own DB pool (DB_POOL_MAX_SIZE) and caches.
+    # Service-specific bind settings: the shared root .env sets PORT for the
+    # backend, and AI_SERVICE_URL expects this service on 8000 by default
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("AI_SERVICE_HOST", "0.0.0.0"),
+        port=int(os.getenv("AI_SERVICE_PORT", "8000")),
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        reload=reload,
+        # --reload and --workers are mutually exclusive in uvicorn
+        workers=None if reload else int(os.getenv("WEB_CONCURRENCY", "1")),
+        timeout_keep_alive=5
+    )
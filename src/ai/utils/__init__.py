@@ -2,12 +2,13 @@
 Utility modules for the AI service.
 """
 
-from .token_counter import token_counter, estimate_tokens
+from .token_counter import token_counter, estimate_tokens, load_tokenizer
 from .api_key_manager import api_key_manager, ensure_api_key
 
 __all__ = [
     'token_counter',
     'estimate_tokens',
+    'load_tokenizer',
     'api_key_manager',
     'ensure_api_key'
 ]
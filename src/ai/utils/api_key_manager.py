@@ -5,12 +5,16 @@ Manages OpenAI API keys with interactive prompts and .env file storage.
 """
 
 import os
+import time
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional, Tuple
 
 logger = logging.getLogger("api_key_manager")
 
+# Seconds a test_key_async result is reused; UIs poll the test endpoint
+KEY_TEST_TTL = float(os.getenv("API_KEY_TEST_TTL", "10"))
+
 
 class APIKeyManager:
     """Manages API keys with secure storage and validation."""
@@ -24,6 +28,12 @@ class APIKeyManager:
         """
         self.env_file = Path(env_file)
         self.env_path = self._find_env_file()
+        # (key, masked form) for the most recently masked key
+        self._masked: Optional[Tuple[str, str]] = None
+        # (key, expires at, valid) for the most recent test_key_async call
+        self._key_test: Optional[Tuple[str, float, bool]] = None
+        # (key, AsyncOpenAI client) so repeated tests reuse one connection pool
+        self._test_client: Optional[Tuple[str, Any]] = None
 
     def _find_env_file(self) -> Path:
         """
@@ -66,7 +76,8 @@ class APIKeyManager:
         # Check environment variable first
         api_key = os.getenv("OPENAI_API_KEY")
         if api_key:
-            logger.info("OpenAI API key found in environment")
+            # debug: this is the path every status poll takes
+            logger.debug("OpenAI API key found in environment")
             return api_key
 
         # Check .env file
@@ -170,6 +181,23 @@ class APIKeyManager:
         # OpenAI keys typically start with 'sk-' and are ~51 characters
         return key.startswith('sk-') and len(key) > 20
 
+    def mask_key(self, api_key: str) -> str:
+        """
+        Display form of a key (first 7 and last 4 characters).
+
+        The result is kept until a different key is masked, since status
+        polling asks for the same key over and over.
+
+        Args:
+            api_key: The API key to mask
+
+        Returns:
+            Masked key
+        """
+        if self._masked is None or self._masked[0] != api_key:
+            self._masked = (api_key, f"{api_key[:7]}...{api_key[-4:]}")
+        return self._masked[1]
+
     def save_key_to_env(self, api_key: str) -> bool:
         """
         Save API key to .env file.
@@ -243,6 +271,45 @@ class APIKeyManager:
             logger.error(f"API key validation failed: {e}")
             return False
 
+    async def test_key_async(self, api_key: Optional[str] = None) -> bool:
+        """
+        Async variant of test_key for request handlers.
+
+        The result for a key is reused for KEY_TEST_TTL seconds, so polling
+        doesn't turn into a stream of calls to OpenAI.
+
+        Args:
+            api_key: API key to test (uses stored key if None)
+
+        Returns:
+            True if key works
+        """
+        if not api_key:
+            api_key = self.get_api_key(prompt_if_missing=False)
+
+        if not api_key:
+            return False
+
+        if self._key_test and self._key_test[0] == api_key and self._key_test[1] > time.monotonic():
+            return self._key_test[2]
+
+        try:
+            if self._test_client is None or self._test_client[0] != api_key:
+                from openai import AsyncOpenAI
+                self._test_client = (api_key, AsyncOpenAI(api_key=api_key, timeout=10))
+
+            # Make a minimal API call to test
+            await self._test_client[1].models.list()
+            logger.info("API key validated successfully")
+            valid = True
+
+        except Exception as e:
+            logger.error(f"API key validation failed: {e}")
+            valid = False
+
+        self._key_test = (api_key, time.monotonic() + KEY_TEST_TTL, valid)
+        return valid
+
     def update_key(self):
         """Update the API key interactively."""
         print("\n" + "="*70)
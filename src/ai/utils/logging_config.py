@@ -8,6 +8,7 @@ Provides comprehensive logging setup for the PSScript AI service:
 4. Request/response logging
 5. Performance metrics logging
 6. Security event logging
+7. Non-blocking handlers: records are queued and written by a listener thread
 
 Best practices:
 - Use structured logging for better searchability
@@ -22,6 +23,9 @@ import json
 import sys
 import os
 import re
+import copy
+import queue
+import atexit
 from typing import Optional, Dict, Any
 from datetime import datetime
 from dataclasses import dataclass, asdict
@@ -79,6 +83,90 @@ def mask_sensitive_data(message: str) -> str:
     return masked
 
 
+def _record_context(record: logging.LogRecord):
+    """Request/session IDs stamped on a queued record, else the current context."""
+    if hasattr(record, 'request_id_ctx'):
+        return record.request_id_ctx, record.session_id_ctx
+    return request_id_var.get(), session_id_var.get()
+
+
+# Records buffered for the listener thread. When output stalls the oldest
+# records are dropped rather than blocking callers or growing without bound.
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that hands records to a listener thread for formatting and I/O.
+
+    Request context lives in ContextVars of the calling task, so it is copied
+    onto the record before it is queued; the message is merged with its args
+    so later mutation of the args cannot change what gets logged.
+
+    The queue is bounded and behaves as a ring buffer: a full queue drops its
+    oldest record, and a warning with the drop count is queued once there is
+    room again.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.request_id_ctx = request_id_var.get()
+        record.session_id_ctx = session_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.dropped and self._put(self._drop_notice()):
+            self.dropped = 0
+        while not self._put(record):
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass  # the listener just made room
+
+    def _put(self, record: logging.LogRecord) -> bool:
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+    def _drop_notice(self) -> logging.LogRecord:
+        return logging.makeLogRecord({
+            'name': 'psscript.logging',
+            'levelno': logging.WARNING,
+            'levelname': 'WARNING',
+            'msg': f"Log queue full: dropped {self.dropped} oldest records",
+        })
+
+
+class _BoundedQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose stop sentinel waits for room instead of failing on a full queue."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+# Listener thread that owns the real handlers (started by setup_logging)
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _stop_queue_listener() -> None:
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()  # drains queued records before returning
+        _queue_listener = None
+
+
+atexit.register(_stop_queue_listener)
+
+
 class StructuredFormatter(logging.Formatter):
     """JSON formatter for structured logging."""
 
@@ -94,8 +182,7 @@ class StructuredFormatter(logging.Formatter):
         }
 
         # Add request context if available
-        request_id = request_id_var.get()
-        session_id = session_id_var.get()
+        request_id, session_id = _record_context(record)
         if request_id:
             log_data['request_id'] = request_id
         if session_id:
@@ -142,7 +229,7 @@ class ColoredFormatter(logging.Formatter):
         timestamp = datetime.fromtimestamp(record.created).strftime('%H:%M:%S')
 
         # Get context info
-        request_id = request_id_var.get()
+        request_id, _ = _record_context(record)
         req_str = f" [{request_id[:8]}]" if request_id else ""
 
         # Format the message
@@ -270,6 +357,8 @@ def setup_logging(
         max_bytes: Maximum log file size before rotation
         backup_count: Number of backup files to keep
     """
+    global _queue_listener
+
     # Set custom logger class
     logging.setLoggerClass(PSScriptLogger)
 
@@ -278,7 +367,9 @@ def setup_logging(
     root_logger.setLevel(getattr(logging, level.upper(), logging.INFO))
 
     # Clear existing handlers
+    _stop_queue_listener()
     root_logger.handlers.clear()
+    handlers = []
 
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
@@ -289,7 +380,7 @@ def setup_logging(
     else:
         console_handler.setFormatter(ColoredFormatter())
 
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
 
     # File handler with rotation
     if log_file:
@@ -303,7 +394,16 @@ def setup_logging(
         )
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(StructuredFormatter())
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    # Callers only enqueue; formatting and stream/file writes happen on the
+    # listener thread, so a slow stdout or disk never stalls the event loop
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root_logger.addHandler(ContextQueueHandler(log_queue))
+    _queue_listener = _BoundedQueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    _queue_listener.start()
 
     # Security log (separate file for security events)
     if log_file:
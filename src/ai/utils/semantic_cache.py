@@ -0,0 +1,242 @@
+"""
+Semantic Response Cache
+
+Redis-backed cache for expensive AI responses. Lookups first try an exact
+match on the SHA-256 of the request content, then fall back to the nearest
+cached embedding: if its cosine similarity clears the threshold, the cached
+response is reused instead of calling the model again.
+
+Entries are partitioned by namespace (e.g. "analyze", "chat"), by a caller
+supplied scope (model, flags) and by embedding dimension, so responses are
+never shared across models or incompatible embedding spaces. The cache is a
+no-op when REDIS_URL is not configured.
+
+Hits refresh an entry's TTL and its recency score, so the per-scope index is
+trimmed least-recently-used first and frequently asked questions stay cached.
+"""
+
+import os
+import time
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+import numpy as np
+import orjson
+
+try:
+    from redis.asyncio import Redis
+except ImportError:  # redis is optional for local development
+    Redis = None
+
+logger = logging.getLogger("semantic_cache")
+
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))  # seconds
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+
+EmbedFn = Callable[[str], Awaitable[List[float]]]
+
+
+class SemanticCache:
+    """Exact + nearest-neighbour response cache stored in Redis."""
+
+    def __init__(
+        self,
+        namespace: str,
+        redis_url: Optional[str] = None,
+        ttl: int = SEMANTIC_CACHE_TTL,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            namespace: Key prefix separating endpoints (e.g. "analyze", "chat")
+            redis_url: Redis connection URL (defaults to REDIS_URL)
+            ttl: Per-entry time to live in seconds
+            threshold: Minimum cosine similarity for a semantic hit
+            max_entries: Most recent entries considered for semantic lookup
+        """
+        self.namespace = namespace
+        self.redis_url = redis_url or os.getenv("REDIS_URL")
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._redis = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.redis_url) and Redis is not None
+
+    def _client(self):
+        if self._redis is None:
+            self._redis = Redis.from_url(self.redis_url)
+        return self._redis
+
+    def _prefix(self, scope: str) -> str:
+        scope_hash = hashlib.sha256(scope.encode("utf-8")).hexdigest()[:16]
+        return f"semcache:{self.namespace}:{scope_hash}"
+
+    @staticmethod
+    def _content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def get(
+        self,
+        content: str,
+        embed: Optional[EmbedFn] = None,
+        scope: str = ""
+    ) -> Optional[Any]:
+        """
+        Look up a cached response for content.
+
+        Args:
+            content: Request content the response was generated for
+            embed: Async embedding function; enables near-duplicate hits
+            scope: Extra key material (model, flags) the response depends on
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        prefix = self._prefix(scope)
+        content_hash = self._content_hash(content)
+
+        try:
+            redis = self._client()
+
+            cached = await redis.get(f"{prefix}:exact:{content_hash}")
+            if cached is not None:
+                logger.debug(f"Exact cache hit in {self.namespace}")
+                dimensions = await redis.smembers(f"{prefix}:dims")
+                await self._touch(redis, prefix, content_hash, dimensions)
+                return orjson.loads(cached)
+
+            if embed is None:
+                return None
+
+            # Skip the embedding call entirely when nothing is cached yet
+            if not await redis.exists(f"{prefix}:dims"):
+                return None
+
+            query = self._normalize(await embed(content))
+            index_key = f"{prefix}:{query.shape[0]}:index"
+
+            members = await redis.zrevrange(index_key, 0, self.max_entries - 1)
+            if not members:
+                return None
+
+            hashes = [m.decode() if isinstance(m, bytes) else m for m in members]
+            vectors = await redis.mget([f"{prefix}:{query.shape[0]}:vec:{h}" for h in hashes])
+
+            live = [(h, v) for h, v in zip(hashes, vectors) if v is not None]
+            expired = [h for h, v in zip(hashes, vectors) if v is None]
+            if expired:
+                await redis.zrem(index_key, *expired)
+            if not live:
+                return None
+
+            matrix = np.stack([np.frombuffer(v, dtype=np.float32) for _, v in live])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            cached = await redis.get(f"{prefix}:exact:{live[best][0]}")
+            if cached is None:
+                return None
+
+            logger.debug(f"Semantic cache hit in {self.namespace} (similarity={scores[best]:.3f})")
+            await self._touch(redis, prefix, live[best][0], (query.shape[0],))
+            return orjson.loads(cached)
+
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None
+
+    async def _touch(self, redis, prefix: str, content_hash: str, dimensions) -> None:
+        """Mark an entry as recently used so LRU trimming and TTL expiry keep it."""
+        now = time.time()
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.expire(f"{prefix}:exact:{content_hash}", self.ttl)
+                for dimension in dimensions:
+                    dimension = dimension.decode() if isinstance(dimension, bytes) else dimension
+                    index_key = f"{prefix}:{dimension}:index"
+                    # xx: only bump entries still in the index, never re-add evicted ones
+                    pipe.zadd(index_key, {content_hash: now}, xx=True)
+                    pipe.expire(index_key, self.ttl)
+                    pipe.expire(f"{prefix}:{dimension}:vec:{content_hash}", self.ttl)
+                pipe.expire(f"{prefix}:dims", self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            # A failed refresh only shortens the entry's life; the hit still counts
+            logger.debug(f"Semantic cache touch failed: {e}")
+
+    async def set(
+        self,
+        content: str,
+        value: Any,
+        embed: Optional[EmbedFn] = None,
+        scope: str = ""
+    ) -> None:
+        """
+        Store a response for content.
+
+        Args:
+            content: Request content the response was generated for
+            value: JSON-serializable response
+            embed: Async embedding function; registers the entry for near-duplicate hits
+            scope: Extra key material (model, flags) the response depends on
+        """
+        if not self.enabled:
+            return
+
+        prefix = self._prefix(scope)
+        content_hash = self._content_hash(content)
+
+        try:
+            redis = self._client()
+            await redis.setex(
+                f"{prefix}:exact:{content_hash}",
+                self.ttl,
+                orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+            )
+
+            if embed is None:
+                return
+
+            vector = self._normalize(await embed(content))
+            dimension = vector.shape[0]
+            index_key = f"{prefix}:{dimension}:index"
+
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.setex(f"{prefix}:{dimension}:vec:{content_hash}", self.ttl, vector.tobytes())
+                pipe.zadd(index_key, {content_hash: time.time()})
+                pipe.zremrangebyrank(index_key, 0, -self.max_entries - 1)
+                pipe.expire(index_key, self.ttl)
+                pipe.sadd(f"{prefix}:dims", dimension)
+                pipe.expire(f"{prefix}:dims", self.ttl)
+                await pipe.execute()
+
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed: {e}")
+
+
+# Shared caches for the analysis and chat endpoints. /analyze uses exact
+# lookups only (no embed function): near-duplicate scripts can differ in
+# exactly the lines that decide their security and risk scores.
+analysis_cache = SemanticCache("analyze")
+chat_cache = SemanticCache("chat")
+# Exact-content results of /security-analysis, /categorize and /documentation
+script_cache = SemanticCache("script")
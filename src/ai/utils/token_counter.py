@@ -4,14 +4,36 @@ Token Counter and Price Estimator
 Tracks token usage and estimates costs for OpenAI API calls.
 """
 
+import os
+import atexit
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, Tuple
 from datetime import datetime
 import json
 from pathlib import Path
 
+import orjson
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 logger = logging.getLogger("token_counter")
 
+# Tokenizer shared by every estimate; o200k_base covers the GPT-4.1, GPT-5
+# and o-series models. Loaded once on first use, since building it is costly.
+TOKENIZER_ENCODING = "o200k_base"
+_encoder = None
+_encoder_unavailable = False
+
+# Usage writes are coalesced: a burst of tracked calls rewrites the file once,
+# this many seconds after the first of them, off the caller's thread
+USAGE_FLUSH_DELAY = float(os.getenv("TOKEN_USAGE_FLUSH_DELAY", "1.0"))
+
 # AI Model Pricing as of 26 April 2026 (per 1M tokens)
 # gpt-4o, gpt-4o-mini deprecated Feb 2026
 PRICING = {
@@ -94,6 +116,12 @@ class TokenCounter:
         """
         self.usage_file = Path(usage_file)
         self.usage_data = self._load_usage()
+        # Bumped on every change so readers can cache derived views
+        self.version = 0
+        self._flush_lock = threading.Lock()
+        self._flush_timer = None
+        # Pending changes are written on interpreter exit as well
+        atexit.register(self.flush)
 
     def _load_usage(self) -> Dict:
         """Load usage data from file."""
@@ -120,11 +148,32 @@ class TokenCounter:
         """Save usage data to file."""
         try:
             self.usage_data["last_updated"] = datetime.now().isoformat()
-            with open(self.usage_file, 'w') as f:
-                json.dump(self.usage_data, f, indent=2)
+            # One orjson call snapshots the data without releasing the GIL, so
+            # a concurrent track_usage can't change it mid-serialization
+            data = orjson.dumps(self.usage_data, option=orjson.OPT_INDENT_2)
+            tmp_file = self.usage_file.with_name(self.usage_file.name + ".tmp")
+            tmp_file.write_bytes(data)
+            os.replace(tmp_file, self.usage_file)
         except Exception as e:
             logger.error(f"Error saving usage data: {e}")
 
+    def _schedule_save(self):
+        """Write usage data after USAGE_FLUSH_DELAY unless a write is already pending."""
+        with self._flush_lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(USAGE_FLUSH_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """Write any pending usage changes now."""
+        with self._flush_lock:
+            if self._flush_timer is None:
+                return
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        self._save_usage()
+
     def track_usage(
         self,
         model: str,
@@ -183,7 +232,8 @@ class TokenCounter:
         if len(self.usage_data["sessions"]) > 1000:
             self.usage_data["sessions"] = self.usage_data["sessions"][-1000:]
 
-        self._save_usage()
+        self.version += 1
+        self._schedule_save()
 
         logger.info(
             f"Token usage tracked - Model: {model}, Tokens: {total_tokens}, "
@@ -291,6 +341,7 @@ class TokenCounter:
     def reset_usage(self):
         """Reset all usage data."""
         self.usage_data = self._create_empty_usage()
+        self.version += 1
         self._save_usage()
         logger.info("Usage data reset")
 
@@ -299,12 +350,59 @@ class TokenCounter:
 token_counter = TokenCounter()
 
 
+def _get_encoder():
+    """Return the shared tiktoken encoder, or None if it cannot be loaded."""
+    global _encoder, _encoder_unavailable
+    if _encoder is None and not _encoder_unavailable:
+        if tiktoken is None:
+            _encoder_unavailable = True
+        else:
+            try:
+                _encoder = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                logger.warning(f"tiktoken encoding unavailable, using heuristic token estimates: {e}")
+                _encoder_unavailable = True
+    return _encoder
+
+
+def load_tokenizer() -> bool:
+    """Load the shared encoder now; returns whether exact counts are available."""
+    return _get_encoder() is not None
+
+
+# Exact counts of recently tokenized texts, keyed by a 128-bit digest so the
+# cache never keeps (possibly multi-megabyte) request bodies alive. Large
+# inputs are counted on worker threads, hence the lock.
+TOKEN_COUNT_CACHE_SIZE = 1024
+_token_counts: "OrderedDict[bytes, int]" = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+
+def _count_tokens(text: str) -> int:
+    """Exact token count for text; cached so repeat scripts aren't re-tokenized."""
+    key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _token_counts_lock:
+        count = _token_counts.get(key)
+        if count is not None:
+            _token_counts.move_to_end(key)
+            return count
+
+    # Special-token text is counted as plain text, so skip that scan entirely
+    count = len(_encoder.encode_ordinary(text))
+
+    with _token_counts_lock:
+        _token_counts[key] = count
+        if len(_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+    return count
+
+
 def estimate_tokens(text: str) -> int:
     """
     Estimate the number of tokens in a text.
 
-    Uses a simple heuristic: ~4 characters per token for English text.
-    For more accurate counting, use tiktoken library.
+    Uses tiktoken when its encoding is available, otherwise a simple
+    heuristic of ~4 characters per token for English text.
 
     Args:
         text: The text to estimate tokens for
@@ -312,7 +410,9 @@ def estimate_tokens(text: str) -> int:
     Returns:
         Estimated number of tokens
     """
-    return len(text) // 4
+    if _get_encoder() is None:
+        return len(text) // 4
+    return _count_tokens(text)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+-- Migration: Guarantee one script_analysis row per script
+-- Date: 2026-10-16
+-- Rationale: the AI service persists analyses with a single
+-- INSERT ... ON CONFLICT (script_id) DO UPDATE, which requires a unique
+-- constraint or index on script_analysis.script_id. The hosted schema declares
+-- one, but databases bootstrapped from scripts/setup/setup-db.sql do not and
+-- may already hold duplicate rows. Keep the most recent row per script, then
+-- add the unique index if no unique constraint covers the column yet.
+
+SET search_path = public, pg_catalog;
+
+DO $$
+BEGIN
+  IF to_regclass('public.script_analysis') IS NOT NULL THEN
+    DELETE FROM public.script_analysis AS sa
+    USING public.script_analysis AS newer
+    WHERE sa.script_id = newer.script_id
+      AND (COALESCE(sa.updated_at, '-infinity'), sa.id)
+        < (COALESCE(newer.updated_at, '-infinity'), newer.id);
+
+    IF NOT EXISTS (
+      SELECT 1
+      FROM pg_index AS i
+      JOIN pg_attribute AS a
+        ON a.attrelid = i.indrelid
+       AND a.attnum = i.indkey[0]
+      WHERE i.indrelid = 'public.script_analysis'::regclass
+        AND i.indisunique
+        AND i.indnkeyatts = 1
+        AND i.indpred IS NULL
+        AND a.attname = 'script_id'
+    ) THEN
+      CREATE UNIQUE INDEX idx_script_analysis_script_id_unique
+        ON public.script_analysis (script_id);
+    END IF;
+  END IF;
+END $$;
@@ -0,0 +1,20 @@
+-- Migration: Half-precision HNSW index for script embedding k-NN
+-- Date: 2026-10-16
+-- Rationale: an HNSW index over embedding::halfvec(1536) is half the size of
+-- the full-precision index, so more of the graph stays in shared buffers and
+-- each hop reads half the bytes. The AI service ranks /similar on this
+-- expression when pgvector >= 0.7 is installed. The column itself stays
+-- vector(1536) because the backend and Netlify API query it directly.
+
+SET search_path = public, extensions, pg_catalog;
+
+DO $$
+BEGIN
+  IF to_regclass('public.script_embeddings') IS NOT NULL
+     AND EXISTS (SELECT 1 FROM pg_type WHERE typname = 'halfvec') THEN
+    CREATE INDEX IF NOT EXISTS idx_script_embeddings_hnsw_halfvec
+      ON public.script_embeddings
+      USING hnsw((embedding::halfvec(1536)) halfvec_cosine_ops)
+      WITH (m = 16, ef_construction = 64);
+  END IF;
+END $$;
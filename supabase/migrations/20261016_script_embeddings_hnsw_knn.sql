@@ -0,0 +1,24 @@
+-- Migration: Serve /similar k-NN from a single HNSW index on script_embeddings
+-- Date: 2026-10-16
+-- Rationale: the AI service now runs ORDER BY embedding <=> $query LIMIT k in
+-- pgvector instead of pulling every embedding into Python. The hosted schema
+-- still carries the original IVFFlat index next to idx_script_embeddings_hnsw;
+-- keeping both doubles write amplification and lets the planner pick the
+-- lower-recall index. Ensure the HNSW index exists, then drop the IVFFlat one.
+
+SET search_path = public, extensions, pg_catalog;
+
+DO $$
+BEGIN
+  IF to_regclass('public.script_embeddings') IS NOT NULL
+     AND EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'vector') THEN
+    CREATE INDEX IF NOT EXISTS idx_script_embeddings_hnsw
+      ON public.script_embeddings
+      USING hnsw(embedding vector_cosine_ops)
+      WITH (m = 16, ef_construction = 64);
+
+    DROP INDEX IF EXISTS public.script_embeddings_idx;
+
+    ANALYZE public.script_embeddings;
+  END IF;
+END $$;